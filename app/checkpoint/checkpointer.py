@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import OrderedDict
+from langgraph.checkpoint.memory import InMemorySaver
+from app.config import Config
+from app.logger import logging
+
+
+def _size(value) -> int:
+    """Bytes held by a stored entry: serialized payloads nested in tuples/dicts."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_size(v) for v in value.values())
+    return 0
+
+
+class _ThreadInfo:
+    __slots__ = ("last_access", "bytes", "blobs", "writes", "checkpoints")
+
+    def __init__(self):
+        self.last_access = time.monotonic()
+        self.bytes = 0
+        self.blobs = {}  # blob key -> size
+        self.writes = {}  # (thread_id, ns, checkpoint_id) -> size
+        self.checkpoints = OrderedDict()  # (ns, checkpoint_id) -> (size, channel_versions)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """``InMemorySaver`` with bounded memory.
+
+    Only the last ``history`` checkpoints of each thread are kept, along with
+    the channel blobs they reference. Whole threads are evicted least recently
+    used first once they are idle for longer than ``ttl_seconds``, once there
+    are more than ``max_threads`` of them, or once the total serialized size
+    exceeds ``max_bytes``. The thread being written is never evicted.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_threads: int = 1000, max_bytes: int = 256 * 1024 * 1024,
+                 history: int = 2):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.history = max(1, history)
+        self.total_bytes = 0
+        self._threads = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _touch(self, thread_id: str) -> _ThreadInfo:
+        info = self._threads.get(thread_id)
+        if info is None:
+            info = self._threads[thread_id] = _ThreadInfo()
+        else:
+            self._threads.move_to_end(thread_id)
+            info.last_access = time.monotonic()
+        return info
+
+    def _account(self, info: _ThreadInfo, delta: int):
+        info.bytes += delta
+        self.total_bytes += delta
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"threads": len(self._threads), "bytes": self.total_bytes}
+
+    def get_tuple(self, config):
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            if thread_id in self._threads:
+                self._touch(thread_id)
+            result = super().get_tuple(config)
+            if result is not None:
+                # The parent class reads pending writes through a defaultdict,
+                # leaving an empty entry behind for every lookup; drop it.
+                configurable = result.config["configurable"]
+                key = (thread_id, configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+                if not self.writes.get(key, True):
+                    del self.writes[key]
+            return result
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            ns = config["configurable"]["checkpoint_ns"]
+            info = self._touch(thread_id)
+
+            for channel, version in new_versions.items():
+                key = (thread_id, ns, channel, version)
+                if key not in info.blobs:
+                    info.blobs[key] = _size(self.blobs[key])
+                    self._account(info, info.blobs[key])
+
+            size = _size(self.storage[thread_id][ns][checkpoint["id"]])
+            info.checkpoints[(ns, checkpoint["id"])] = (size, dict(checkpoint["channel_versions"]))
+            self._account(info, size)
+
+            self._prune_history(thread_id, ns, info)
+            self._evict(keep=thread_id)
+            return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            thread_id = config["configurable"]["thread_id"]
+            outer_key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+            info = self._touch(thread_id)
+            size = _size(self.writes.get(outer_key, {}))
+            self._account(info, size - info.writes.get(outer_key, 0))
+            info.writes[outer_key] = size
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            info = self._threads.pop(thread_id, None)
+            if info is None:
+                return super().delete_thread(thread_id)
+            self.storage.pop(thread_id, None)
+            for key in info.writes:
+                self.writes.pop(key, None)
+            for key in info.blobs:
+                self.blobs.pop(key, None)
+            self.total_bytes -= info.bytes
+
+    def _prune_history(self, thread_id: str, ns: str, info: _ThreadInfo):
+        ids = [cid for (n, cid) in info.checkpoints if n == ns]
+        if len(ids) <= self.history:
+            return
+        for cid in ids[:-self.history]:
+            size, _ = info.checkpoints.pop((ns, cid))
+            self.storage[thread_id][ns].pop(cid, None)
+            self._account(info, -size)
+            outer_key = (thread_id, ns, cid)
+            if outer_key in info.writes:
+                self.writes.pop(outer_key, None)
+                self._account(info, -info.writes.pop(outer_key))
+
+        referenced = set()
+        for (n, _), (_, versions) in info.checkpoints.items():
+            if n == ns:
+                referenced.update(versions.items())
+        for key in [k for k in info.blobs if k[1] == ns and (k[2], k[3]) not in referenced]:
+            self.blobs.pop(key, None)
+            self._account(info, -info.blobs.pop(key))
+
+    def _evict(self, keep: str = None):
+        now = time.monotonic()
+        while self._threads:
+            thread_id, info = next(iter(self._threads.items()))
+            if thread_id == keep:
+                break
+            expired = self.ttl_seconds and now - info.last_access > self.ttl_seconds
+            if not (expired or len(self._threads) > self.max_threads or self.total_bytes > self.max_bytes):
+                break
+            logging.info(f"Evicting conversation thread {thread_id} ({info.bytes} bytes).")
+            self.delete_thread(thread_id)
+
+
+def create_checkpointer():
+    """Build the checkpointer selected by ``Config.CHECKPOINT_BACKEND``."""
+    if Config.CHECKPOINT_BACKEND == "sqlite":
+        try:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError as e:
+            raise ImportError(
+                "CHECKPOINT_BACKEND=sqlite requires `pip install langgraph-checkpoint-sqlite aiosqlite`"
+            ) from e
+        logging.info(f"Using SQLite checkpointer at {Config.CHECKPOINT_SQLITE_PATH}")
+        return AsyncSqliteSaver(aiosqlite.connect(Config.CHECKPOINT_SQLITE_PATH))
+
+    logging.info("Using bounded in-memory checkpointer.")
+    return BoundedMemorySaver(
+        ttl_seconds=Config.SESSION_TTL_SECONDS,
+        max_threads=Config.MAX_SESSIONS,
+        max_bytes=Config.CHECKPOINT_MAX_BYTES,
+        history=Config.CHECKPOINT_HISTORY,
+    )
+
+
+async def close_checkpointer(checkpointer):
+    """Close the SQLite connection, if any, before the event loop goes away."""
+    conn = getattr(checkpointer, "conn", None)
+    if conn is not None:
+        await conn.close()
@@ -6,4 +6,63 @@ load_dotenv()
 class Config:
     HUGGINGFACEHUB_API_KEY = os.getenv('HUGGINGFACEHUB_API_TOKEN')
     qroq_api_key = os.getenv('GROQ_API_KEY')
-    VECTOR_DB_PATH = 'vector_db'
\ No newline at end of file
+    VECTOR_DB_PATH = 'vector_db'
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 1))
+    INGEST_MAX_QUEUE = int(os.getenv('INGEST_MAX_QUEUE', 8))
+    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 10 * 1024 * 1024))
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+    EMBEDDING_MODEL_FILE = os.getenv('EMBEDDING_MODEL_FILE', '')
+    EMBEDDING_TOLERANCE = float(os.getenv('EMBEDDING_TOLERANCE', 0.99))
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 1024))
+    SEGMENT_COMPACT_THRESHOLD = int(os.getenv('SEGMENT_COMPACT_THRESHOLD', 16))
+    FAISS_INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'flat')
+    FAISS_NLIST = int(os.getenv('FAISS_NLIST', 0))
+    FAISS_PQ_M = int(os.getenv('FAISS_PQ_M', 0))
+    FAISS_HNSW_M = int(os.getenv('FAISS_HNSW_M', 32))
+    FAISS_NPROBE = int(os.getenv('FAISS_NPROBE', 16))
+    FAISS_EF_SEARCH = int(os.getenv('FAISS_EF_SEARCH', 64))
+    FAISS_TRAIN_SAMPLE = int(os.getenv('FAISS_TRAIN_SAMPLE', 100000))
+    FAISS_RETRAIN_GROWTH = float(os.getenv('FAISS_RETRAIN_GROWTH', 2.0))
+    EMBED_WORKERS = int(os.getenv('EMBED_WORKERS', 0))
+    EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', 64))
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 256))
+    PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', 0))
+    PARSE_PAGES_PER_TASK = int(os.getenv('PARSE_PAGES_PER_TASK', 8))
+    CHECKPOINT_BACKEND = os.getenv('CHECKPOINT_BACKEND', 'memory')
+    CHECKPOINT_SQLITE_PATH = os.getenv('CHECKPOINT_SQLITE_PATH', 'checkpoints.sqlite')
+    CHECKPOINT_HISTORY = int(os.getenv('CHECKPOINT_HISTORY', 2))
+    CHECKPOINT_MAX_BYTES = int(os.getenv('CHECKPOINT_MAX_BYTES', 256 * 1024 * 1024))
+    SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 3600))
+    MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', 1000))
+    CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', 3000))
+    CONTEXT_TOOL_OUTPUT_CHARS = int(os.getenv('CONTEXT_TOOL_OUTPUT_CHARS', 500))
+    CONTEXT_SUMMARIZE = os.getenv('CONTEXT_SUMMARIZE', 'true').lower() in ('1', 'true', 'yes')
+    CONTEXT_SUMMARY_WORDS = int(os.getenv('CONTEXT_SUMMARY_WORDS', 200))
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.95))
+    ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 1024))
+    RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')
+    HYBRID_FETCH_K = int(os.getenv('HYBRID_FETCH_K', 20))
+    RRF_K = int(os.getenv('RRF_K', 60))
+    DEFAULT_COLLECTION = os.getenv('DEFAULT_COLLECTION', 'default')
+    COLLECTION_MEMORY_BUDGET = int(os.getenv('COLLECTION_MEMORY_BUDGET', 2 * 1024 * 1024 * 1024))
+    FILTER_EXACT_MAX = int(os.getenv('FILTER_EXACT_MAX', 4096))
+    TOMBSTONE_COMPACT_RATIO = float(os.getenv('TOMBSTONE_COMPACT_RATIO', 0.2))
+    RERANK_ENABLED = os.getenv('RERANK_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    RERANK_MODEL = os.getenv('RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+    RERANK_FETCH_K = int(os.getenv('RERANK_FETCH_K', 50))
+    RERANK_MAX_CANDIDATES = int(os.getenv('RERANK_MAX_CANDIDATES', 50))
+    RERANK_MIN_SCORE = float(os.getenv('RERANK_MIN_SCORE', '-inf'))
+    RERANK_LATENCY_BUDGET_MS = float(os.getenv('RERANK_LATENCY_BUDGET_MS', 300))
+    RERANK_MAX_LENGTH = int(os.getenv('RERANK_MAX_LENGTH', 512))
+    WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+    WARMUP_RETRY_DELAY = float(os.getenv('WARMUP_RETRY_DELAY', 1.0))
+    WARMUP_RETRY_MAX_DELAY = float(os.getenv('WARMUP_RETRY_MAX_DELAY', 60.0))
+    BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', 256))
+    BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 8))
+    CHAT_PIPELINE = os.getenv('CHAT_PIPELINE', 'graph')
+    QUERY_REFINEMENT = os.getenv('QUERY_REFINEMENT', 'true').lower() in ('1', 'true', 'yes')
+    REFINEMENT_CACHE_SIZE = int(os.getenv('REFINEMENT_CACHE_SIZE', 1024))
+    SERVICE_HISTORY_MESSAGES = int(os.getenv('SERVICE_HISTORY_MESSAGES', 6))
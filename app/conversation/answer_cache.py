@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.logger import logging
+
+
+class SemanticAnswerCache:
+    """Answers to earlier questions, looked up by query embedding.
+
+    A lookup hits when the cosine similarity between the new query and a cached
+    one is at least ``threshold``. Entries are tied to the vector store version
+    they were computed against and the whole cache is dropped as soon as that
+    version changes. At most ``max_entries`` answers are kept, least recently
+    used first out.
+    """
+
+    def __init__(self, embeddings, threshold: float = 0.95, max_entries: int = 1024):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries = OrderedDict()  # query -> (unit vector, answer)
+        self._matrix = None
+        self._keys = []
+        self._lock = threading.Lock()
+
+    def embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, version: int):
+        if version != self.version:
+            if self._entries:
+                logging.info(f"Index version changed to {version}, clearing {len(self._entries)} cached answers.")
+            self._entries.clear()
+            self._matrix = None
+            self.version = version
+
+    def _stack(self):
+        if self._matrix is None and self._entries:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([vector for vector, _ in self._entries.values()])
+        return self._matrix
+
+    def lookup(self, query: str, version: int, vector: np.ndarray = None):
+        """Return the cached answer for ``query`` or None."""
+        if vector is None:
+            vector = self.embed(query)
+        with self._lock:
+            self._check_version(version)
+            matrix = self._stack()
+            if matrix is not None:
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = self._keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    logging.info(f"Answer cache hit for {query!r} (matched {key!r}, similarity {scores[best]:.3f}).")
+                    return self._entries[key][1]
+            self.misses += 1
+            return None
+
+    def store(self, query: str, version: int, answer: str, vector: np.ndarray = None):
+        if vector is None:
+            vector = self.embed(query)
+        with self._lock:
+            if self.version is not None and version < self.version:
+                return  # the index changed while this answer was being generated
+            self._check_version(version)
+            self._entries[query] = (vector, answer)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "index_version": self.version,
+            }
@@ -0,0 +1,122 @@
+from typing import List, Tuple
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from app.logger import logging
+from app.metrics.registry import span
+
+SUMMARY_TAG = "context_summary"
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant "
+    "that answers questions about uploaded documents. Extend the existing summary with "
+    "the new messages. Keep the facts, figures and document references the assistant "
+    "relied on, drop pleasantries, and stay under {max_words} words."
+)
+
+
+def count_tokens(messages: List[BaseMessage]) -> int:
+    return count_tokens_approximately(messages)
+
+
+def turn_starts(messages: List[BaseMessage]) -> List[int]:
+    """Indices of the human messages that open each turn. Cutting history only
+    at these points keeps tool calls and their results together."""
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+class ContextWindow:
+    """Fits a thread's history into a token budget before each LLM call.
+
+    Tool results from earlier turns are shortened to ``tool_output_chars`` in
+    the prompt; the current turn is always sent in full. If the prompt is still
+    over ``max_tokens``, the oldest turns are folded into a rolling summary
+    (or simply dropped when ``summarize`` is off) and removed from the thread.
+    """
+
+    def __init__(self, max_tokens: int = 3000, tool_output_chars: int = 500, summarize: bool = True,
+                 summary_words: int = 200):
+        self.max_tokens = max_tokens
+        self.tool_output_chars = tool_output_chars
+        self.summarize = summarize
+        self.summary_words = summary_words
+
+    def compress(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Shorten tool results that belong to turns before the current one."""
+        starts = turn_starts(messages)
+        current = starts[-1] if starts else 0
+        compressed = []
+        for i, message in enumerate(messages):
+            if i < current and isinstance(message, ToolMessage) and isinstance(message.content, str) \
+                    and len(message.content) > self.tool_output_chars:
+                content = message.content[:self.tool_output_chars] + " ...[truncated]"
+                message = message.model_copy(update={"content": content})
+            compressed.append(message)
+        return compressed
+
+    def system_message(self, system_prompt: str, summary: str) -> SystemMessage:
+        if summary:
+            system_prompt = f"{system_prompt}\n\nSummary of the earlier conversation:\n{summary}"
+        return SystemMessage(content=system_prompt)
+
+    def split(self, system: SystemMessage, messages: List[BaseMessage]) -> int:
+        """Index of the earliest turn from which the rest of the history fits.
+
+        The current turn is always kept, even if it is over budget on its own.
+        """
+        starts = turn_starts(messages)
+        if not starts:
+            return 0
+        system_tokens = count_tokens([system])
+        for start in starts:
+            if system_tokens + count_tokens(messages[start:]) <= self.max_tokens:
+                return start
+        return starts[-1]
+
+    async def update_summary(self, llm, summary: str, folded: List[BaseMessage]) -> str:
+        transcript = "\n".join(f"{message.type}: {message.text}" for message in folded if message.text)
+        prompt = [
+            SystemMessage(content=SUMMARY_PROMPT.format(max_words=self.summary_words)),
+            HumanMessage(content=f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"),
+        ]
+        # Tagged so streaming endpoints can leave the summary out of the answer tokens.
+        with span("llm_summary"):
+            response = await llm.ainvoke(prompt, config={"tags": [SUMMARY_TAG]})
+        return response.text
+
+    async def prepare(self, system_prompt: str, messages: List[BaseMessage], summary: str = "",
+                      llm=None) -> Tuple[List[BaseMessage], dict]:
+        """Return the prompt to send and the state update to apply.
+
+        The update removes folded messages from the thread and stores the new
+        summary; it is empty when the history already fits.
+        """
+        before = count_tokens([self.system_message(system_prompt, summary), *messages])
+        compressed = self.compress(messages)
+        system = self.system_message(system_prompt, summary)
+        update = {}
+
+        if count_tokens([system, *compressed]) > self.max_tokens:
+            cut = self.split(system, compressed)
+            if cut:
+                if self.summarize and llm is not None:
+                    try:
+                        summary = await self.update_summary(llm, summary, compressed[:cut])
+                    except Exception as e:
+                        logging.error(f"Failed to summarize conversation history, dropping it instead: {e}")
+                update = {
+                    "summary": summary,
+                    "messages": [RemoveMessage(id=message.id) for message in messages[:cut] if message.id],
+                }
+                compressed = compressed[cut:]
+                system = self.system_message(system_prompt, summary)
+                logging.info(f"Folded {cut} older messages into the conversation summary.")
+
+        prompt = [system, *compressed]
+        logging.info(f"Prompt tokens (approx.): {before} before windowing, {count_tokens(prompt)} after.")
+        return prompt, update
@@ -1,14 +1,43 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
+import multiprocessing
 import os
-from typing import List
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
+import pypdf
 from langchain_core.documents import Document
+from app.data_processing import pdf_worker
 from app.logger import logging
+from app.metrics.registry import observe, span
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            logging.info(f"Starting PDF parse pool with {workers} workers.")
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+def _observed(result) -> List[Document]:
+    chunks, timings = result
+    for stage, seconds in timings.items():
+        observe(stage, seconds)
+    return chunks
+
 
 class ProcessData:
     """Process a saved file on disk and return a list of text chunks (langchain Documents)."""
 
     SUPPORTED_EXT = (".pdf", ".txt")
+    CHUNK_SIZE = 1000
+    CHUNK_OVERLAP = 200
 
     def __init__(self, file_path: str):
         logging.info(f"Initializing ProcessData for file: {file_path}")
@@ -22,7 +51,7 @@ class ProcessData:
     def _is_supported(self) -> bool:
         return self.filename.lower().endswith(self.SUPPORTED_EXT)
 
-    def process_document(self) -> List[Document]:
+    def load(self) -> List[Document]:
         if not self._is_supported():
             raise ValueError(f"Unsupported file type for {self.filename}")
 
@@ -37,13 +66,62 @@ class ProcessData:
         else:
     
             raise ValueError("Unsupported file type")
+        return documents
 
-    
+    def split(self, documents: List[Document]) -> List[Document]:
         logging.info(f"Splitting document into chunks.")
         text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+            chunk_size=self.CHUNK_SIZE,
+            chunk_overlap=self.CHUNK_OVERLAP
         )
         logging.info(f"Document contains {len(documents)} pages/sections before splitting.")    
         chunks = text_splitter.split_documents(documents)
-        return chunks
\ No newline at end of file
+        return chunks
+
+    def process_document(self) -> List[Document]:
+        return self.split(self.load())
+
+    def page_count(self) -> int:
+        if self.filename.lower().endswith(".pdf"):
+            return len(pypdf.PdfReader(self.file_path).pages)
+        return 1
+
+    def iter_chunks(self, workers: int = 0, pages_per_task: int = 8) -> Iterator[Document]:
+        """Yield chunks in document order as soon as they are ready.
+
+        PDFs are parsed and split in page ranges of ``pages_per_task``, on a
+        process pool when ``workers > 1`` and in process otherwise. Every chunk
+        gets a ``chunk_id`` metadata entry derived from its page and position,
+        so output is identical for any worker count.
+        """
+        if not self._is_supported():
+            raise ValueError(f"Unsupported file type for {self.filename}")
+
+        if not self.filename.lower().endswith(".pdf"):
+            with span("parse"):
+                documents = self.load()
+            with span("split"):
+                chunks = self.split(documents)
+            for index, chunk in enumerate(chunks):
+                chunk.metadata["chunk_id"] = f"c{index}"
+                yield chunk
+            return
+
+        total_pages = self.page_count()
+        ranges = [(start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task)]
+        logging.info(f"Parsing {total_pages} pages of {self.filename} in {len(ranges)} ranges with {workers} workers.")
+        if workers <= 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                yield from _observed(pdf_worker.parse_page_range_timed(self.file_path, start, end,
+                                                                       self.CHUNK_SIZE, self.CHUNK_OVERLAP))
+            return
+
+        pool = _get_parse_pool(workers)
+        pending = deque()
+        for start, end in ranges:
+            pending.append(pool.submit(pdf_worker.parse_page_range_timed, self.file_path, start, end,
+                                       self.CHUNK_SIZE, self.CHUNK_OVERLAP))
+            if len(pending) >= 2 * workers:
+                yield from _observed(pending.popleft().result())
+        while pending:
+            yield from _observed(pending.popleft().result())
@@ -0,0 +1,98 @@
+import hashlib
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.logger import logging
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+class UploadSizeLimit:
+    """ASGI middleware capping request bodies on ``paths``.
+
+    FastAPI parses (and spools) the whole multipart form before the handler
+    runs, so a limit checked by the handler alone only applies once an
+    oversized upload has been received. This rejects it with a 413 before
+    parsing when ``Content-Length`` is over the limit, and as soon as the
+    limit is crossed for bodies without one. ``overhead`` allows for the
+    multipart boundaries and other form fields; ``save_upload`` still checks
+    the file's own size exactly.
+    """
+
+    def __init__(self, app, paths, max_bytes: int, overhead: int = 64 * 1024):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+        self.limit = max_bytes + overhead
+
+    def _message(self) -> str:
+        return f"File exceeds the maximum upload size of {self.max_bytes} bytes"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.limit:
+            logging.error(f"Rejecting upload of {int(length)} bytes before reading it.")
+            return await JSONResponse({"error": self._message()}, status_code=413)(scope, receive, send)
+
+        received = 0
+        too_large = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    too_large = True
+                    # Stops FastAPI's body parsing; the response it makes of
+                    # this is replaced below.
+                    raise HTTPException(status_code=413, detail=self._message())
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if too_large and not started:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large or started:
+                raise
+        if too_large and not started:
+            logging.error(f"Rejecting upload after {received} bytes, over the limit of {self.limit}.")
+            await JSONResponse({"error": self._message()}, status_code=413)(scope, receive, send)
+
+
+async def save_upload(file: UploadFile, path: str, max_bytes: int, chunk_size: int = 1024 * 1024):
+    """Stream an upload to ``path`` in fixed-size chunks.
+
+    The size limit is checked while copying and the SHA-256 digest is computed
+    on the fly, so memory use stays at one chunk regardless of file size. By
+    then the form has been received; ``UploadSizeLimit`` is what stops an
+    oversized request while it is still arriving.
+    Returns ``(size, sha256_hexdigest)``.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(f"File exceeds the maximum upload size of {max_bytes} bytes")
+            digest.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+    logging.info(f"Streamed {size} bytes to {path}")
+    return size, digest.hexdigest()
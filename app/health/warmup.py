@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Callable, List, Tuple
+from app.logger import logging
+
+
+class Warmup:
+    """Runs named warmup steps in a background thread and keeps the readiness
+    state reported by ``/readyz``.
+
+    Steps run in order; the service is ready once all of them succeeded. A
+    failed step is recorded with its error and retried after ``retry_delay``
+    seconds, doubling up to ``max_retry_delay``, so a transient failure (a
+    model download, a full disk) does not leave the service unready until a
+    restart. ``started_at`` is the ``time.perf_counter()`` value time-to-ready
+    is measured from (normally when the app module began importing).
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], object]]], started_at: float = None,
+                 retry_delay: float = 1.0, max_retry_delay: float = 60.0):
+        self.steps = steps
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.import_seconds = None
+        self.ready_seconds = None
+        self._status = {name: {"status": "pending", "seconds": None, "error": None, "attempts": 0}
+                        for name, _ in steps}
+        self._done = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and all(step["status"] == "done" for step in self._status.values())
+
+    def start(self) -> threading.Thread:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def _run_step(self, name: str, step: Callable[[], object]) -> bool:
+        status = self._status[name]
+        status["status"] = "running"
+        status["attempts"] += 1
+        start = time.perf_counter()
+        try:
+            step()
+            status.update(status="done", error=None)
+            return True
+        except Exception as e:
+            logging.error(f"Warmup step {name} failed (attempt {status['attempts']}): {e}")
+            status.update(status="failed", error=str(e))
+            return False
+        finally:
+            status["seconds"] = round(time.perf_counter() - start, 4)
+
+    def run(self):
+        for name, step in self.steps:
+            delay = self.retry_delay
+            while not self._run_step(name, step):
+                logging.info(f"Retrying warmup step {name} in {delay}s.")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+        self.ready_seconds = round(time.perf_counter() - self.started_at, 4)
+        self._done.set()
+        if self.ready:
+            logging.info(f"Ready {self.ready_seconds}s after start (import took {self.import_seconds}s).")
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "ready_seconds": self.ready_seconds,
+            "steps": {name: dict(step) for name, step in self._status.items()},
+        }
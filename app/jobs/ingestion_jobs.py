@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.config import Config
+from app.logger import logging
+
+
+def remove_upload(file_path: str):
+    """Delete an uploaded file together with its per-upload directory."""
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        os.rmdir(os.path.dirname(file_path))
+    except Exception:
+        pass
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue has no free slot for a new job."""
+
+
+class IngestionJob:
+    """State of a single upload moving through parse -> embed -> persist."""
+
+    def __init__(self, filename: str, file_path: str, sha256: str = None, collection: str = None,
+                 replace: bool = False):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.collection = collection
+        self.replace = replace
+        self.file_path = file_path
+        self.sha256 = sha256
+        self.status = "queued"
+        self.stage = "queued"
+        self.error = None
+        self.pages = None
+        self.chunks = None
+        self.new_chunks = None
+        self.skipped_chunks = None
+        self.duplicate_file = False
+        self.replaced_documents = []
+        self.timings = {}
+        self.created_at = time.time()
+        self.finished_at = None
+        self._stage_started = time.perf_counter()
+
+    def set_stage(self, stage: str):
+        # Parsing and embedding interleave batch by batch, so a stage can be
+        # entered several times; its timing is the total time spent in it.
+        now = time.perf_counter()
+        self.timings[self.stage] = round(self.timings.get(self.stage, 0) + now - self._stage_started, 4)
+        if stage != self.stage:
+            logging.info(f"Ingestion job {self.id} ({self.filename}) entered stage: {stage}")
+        self.stage = stage
+        self._stage_started = now
+
+    def finish(self, status: str, error: str = None):
+        self.set_stage(status)
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "collection": self.collection,
+            "sha256": self.sha256,
+            "status": self.status,
+            "stage": self.stage,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "new_chunks": self.new_chunks,
+            "skipped_chunks": self.skipped_chunks,
+            "duplicate_file": self.duplicate_file,
+            "replaced_documents": self.replaced_documents,
+            "timings": self.timings,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """Bounded worker pool that drains uploaded files into the vector store.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more wait
+    for a worker; anything beyond that is rejected so a burst of uploads cannot
+    take CPU away from queries indefinitely.
+    """
+
+    def __init__(self, collections, max_workers: int = 1, max_queue: int = 8, max_retained: int = 1000):
+        logging.info(f"Initializing IngestionQueue with {max_workers} workers and queue depth {max_queue}")
+        self.collections = collections
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_path: str, filename: str, sha256: str = None, collection: str = None,
+               replace: bool = False) -> IngestionJob:
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Ingestion queue is full, try again later")
+
+        job = IngestionJob(filename, file_path, sha256=sha256, collection=collection, replace=replace)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        self._executor.submit(self._run, job)
+        logging.info(f"Queued ingestion job {job.id} for {filename}")
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict_finished(self):
+        if len(self._jobs) <= self.max_retained:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at is not None]:
+            del self._jobs[job_id]
+            if len(self._jobs) <= self.max_retained:
+                break
+
+    def _run(self, job: IngestionJob):
+        # Imported on first use: langchain_text_splitters imports sentence-transformers
+        # (and torch) at import time, which would otherwise slow down app startup.
+        from app.data_processing.data_processing import ProcessData
+
+        job.status = "running"
+        try:
+            processor = ProcessData(job.file_path)
+
+            job.set_stage("parse")
+            job.pages = processor.page_count()
+            chunks = processor.iter_chunks(
+                workers=Config.PARSE_WORKERS,
+                pages_per_task=Config.PARSE_PAGES_PER_TASK,
+            )
+            vector_store = self.collections.get(job.collection, create=True)
+            result = vector_store.add_documents(
+                chunks,
+                on_stage=job.set_stage,
+                file_hash=job.sha256,
+                filename=job.filename,
+                replace=job.replace,
+            )
+            job.chunks = result["new_chunks"] + result["skipped_chunks"]
+            job.new_chunks = result["new_chunks"]
+            job.skipped_chunks = result["skipped_chunks"]
+            job.duplicate_file = result["duplicate_file"]
+            job.replaced_documents = result.get("replaced_documents", [])
+            self.collections.enforce_budget(keep=job.collection)
+            job.finish("done")
+        except Exception as e:
+            logging.error(f"Ingestion job {job.id} failed: {e}")
+            job.finish("failed", str(e))
+        finally:
+            self._slots.release()
+            remove_upload(job.file_path)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
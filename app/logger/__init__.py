@@ -1,6 +1,8 @@
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 import sys
 
@@ -19,6 +21,9 @@ log_file_path = os.path.join(log_dir_path, LOG_FILE)
 def configure_logger():
     """
     Configures logging with a rotating file handler and a console handler.
+
+    Callers only put records on a queue; a background listener thread does
+    the formatting and the file and console writes.
     """
     # Create a custom logger
     logger = logging.getLogger()
@@ -37,9 +42,17 @@ def configure_logger():
     console_handler.setFormatter(formatter)
     console_handler.setLevel(logging.INFO)
     
-    # Add handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Queue the records and write them from a listener thread
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setLevel(logging.INFO)
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    # Flushes what is still queued on exit.
+    atexit.register(listener.stop)
+    return listener
 
 # Configure the logger
-configure_logger()
\ No newline at end of file
+listener = configure_logger()
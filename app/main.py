@@ -1,28 +1,76 @@
-from langchain_core.messages import BaseMessage, SystemMessage,HumanMessage
+import time
+# Taken before anything else is imported, so startup timings include the imports.
+IMPORT_STARTED = time.perf_counter()
+
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage,HumanMessage
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from app.data_processing.data_processing import ProcessData
-from app.vector_store.vector_store import VectorStore
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from app.vector_store.collection_manager import CollectionManager, InvalidCollectionError
+from app.vector_store.reranker import CrossEncoderReranker
+from app.data_processing.uploads import save_upload, UploadSizeLimit, UploadTooLargeError
+from app.jobs.ingestion_jobs import IngestionQueue, QueueFullError, remove_upload
 from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.memory import InMemorySaver
+from app.checkpoint.checkpointer import create_checkpointer, close_checkpointer
+from app.conversation.context_window import ContextWindow, SUMMARY_TAG
+from app.conversation.answer_cache import SemanticAnswerCache
+from app.health.warmup import Warmup
+from services.llm_service import LLmService
+from app.metrics.registry import metrics, span
+from app.vector_store.embedding_cache import embed_queries
 from langgraph.graph.message import add_messages
 from fastapi.templating import Jinja2Templates
 from langchain_core.tools import tool
-from typing import TypedDict, Annotated,List 
+from langchain_core.runnables import RunnableConfig
+from typing import TypedDict, Annotated,List, Optional
 from langgraph.graph import StateGraph, START
 from fastapi.params import Form as form
+from pydantic import BaseModel
 from langchain_groq import ChatGroq
 from app.config import Config
 from app.logger import logging
+import asyncio
+import json
 import os
 import uvicorn
 import pathlib
+import uuid
 
 
 app = FastAPI()
+# Added first, so it runs inside the metrics middleware and rejections are counted.
+app.add_middleware(UploadSizeLimit, paths=("/uploadfile/",), max_bytes=Config.MAX_UPLOAD_SIZE)
+
+HTTP_REQUESTS = metrics.counter("rag_http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+HTTP_SECONDS = metrics.histogram(
+    "rag_http_request_duration_seconds", "Time to the response headers, in seconds.", ("method", "route")
+)
 
-vector_store = VectorStore()
-logging.info("Vector store initialized.")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, so ids do not explode the label set.
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=str(status))
+
+collections = CollectionManager(
+    memory_budget=Config.COLLECTION_MEMORY_BUDGET,
+    default=Config.DEFAULT_COLLECTION,
+)
+logging.info("Vector store collections initialized.")
+
+ingestion_queue = IngestionQueue(
+    collections,
+    max_workers=Config.INGEST_WORKERS,
+    max_queue=Config.INGEST_MAX_QUEUE,
+)
 
 templates = Jinja2Templates(directory="app/templates")
 
@@ -35,9 +83,33 @@ def sanitize_filename(filename: str) -> str:
     logging.info(f"Sanitizing filename: {filename}")
     return pathlib.Path(filename).name
 
+
+def resolve_collection(collection: str = None, must_exist: bool = True) -> str:
+    try:
+        name = collections.resolve(collection)
+    except InvalidCollectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if must_exist and not collections.exists(name):
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {name}")
+    return name
+
+
+def parse_filter(filter: str = None):
+    """Metadata filters arrive as JSON, e.g. {"filename": "a.pdf", "page": {"$gte": 3}}."""
+    if not filter:
+        return None
+    try:
+        parsed = json.loads(filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
+    if not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail="Invalid filter: expected a JSON object")
+    return parsed
+
 @app.post("/uploadfile/")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(file: UploadFile = File(...), collection: str = form(None), replace: bool = form(True)):
     logging.info(f"Received file upload request: {file.filename}")
+    collection = resolve_collection(collection, must_exist=False)
     if not file or not file.filename:
         logging.error("No file selected for upload.")
         return JSONResponse({"error": "No file selected"}, status_code=400)
@@ -52,97 +124,462 @@ async def upload_file(file: UploadFile = File(...)):
             status_code=400
         )
 
-    logging.info(f"Saving uploaded file to {UPLOAD_DIR}/{filename}")
-    upload_path = os.path.join(UPLOAD_DIR, filename)
+    upload_dir = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+    os.makedirs(upload_dir, exist_ok=True)
+    upload_path = os.path.join(upload_dir, filename)
+    logging.info(f"Saving uploaded file to {upload_path}")
 
  
     try:
-        contents = await file.read()  
-        with open(upload_path, "wb") as f:
-            f.write(contents)
-            logging.info(f"File {filename} saved successfully.")
+        with span("upload_write"):
+            size, sha256 = await save_upload(
+                file,
+                upload_path,
+                max_bytes=Config.MAX_UPLOAD_SIZE,
+                chunk_size=Config.UPLOAD_CHUNK_SIZE,
+            )
+        logging.info(f"File {filename} saved successfully ({size} bytes, sha256 {sha256}).")
+    except UploadTooLargeError as e:
+        logging.error(f"Rejecting upload of {filename}: {e}")
+        remove_upload(upload_path)
+        return JSONResponse({"error": str(e)}, status_code=413)
     except Exception as e:
         logging.error(f"Failed to save uploaded file: {e}")
+        remove_upload(upload_path)
         raise HTTPException(status_code=500, detail=f"Failed to save uploaded file: {e}")
     finally:
         logging.info("Closing uploaded file.")
         await file.close()
 
 
-    try:
-        processor = ProcessData(upload_path)
-        logging.info(f"Processing document: {upload_path}")
-        chunks = processor.process_document()
-        logging.info(f"Document processed into {len(chunks)} chunks.")
-    except Exception as e:
-        logging.error(f"Error processing document: {e}")
-
-        if os.path.exists(upload_path):
-            try:
-                os.remove(upload_path)
-            except Exception:
-                pass
-        raise HTTPException(status_code=500, detail=f"Error processing file: {e}")
-
-
-    try:
-        logging.info(f"Adding {len(chunks)} chunks to vector store.")
-        vector_store.add_documents(chunks)
-    except Exception as e:
-        logging.error(f"Error adding documents to vector store: {e}")
-        if os.path.exists(upload_path):
-            try:
-                os.remove(upload_path)
-            except Exception:
-                pass
-        raise HTTPException(status_code=500, detail=f"Error adding documents: {e}")
-
+    # Loading a cold collection reads its index and segments; off the event loop.
+    vector_store = await asyncio.to_thread(collections.get, collection, create=True)
+    if vector_store.needs_migration:
+        logging.error(f"Rejecting upload of {filename}: collection {collection} needs migrating.")
+        remove_upload(upload_path)
+        return JSONResponse(
+            {"error": f"Collection {collection} holds a pickled vector store; run the docstore migration first"},
+            status_code=409
+        )
+    if vector_store.has_file(sha256):
+        logging.info(f"File {filename} already indexed in collection {collection}, skipping ingestion.")
+        remove_upload(upload_path)
+        entry = vector_store.registry.get_file(sha256)
+        return JSONResponse(
+            {
+                "message": "File already indexed",
+                "duplicate_file": True,
+                "new_chunks": 0,
+                "skipped_chunks": len(entry["chunks"]),
+            },
+            status_code=200
+        )
 
     try:
-        logging.info(f"Removing uploaded file: {upload_path}")
-        if os.path.exists(upload_path):
-            os.remove(upload_path)
-    except Exception:
-       
-        pass
+        job = ingestion_queue.submit(upload_path, filename, sha256=sha256, collection=collection, replace=replace)
+    except QueueFullError as e:
+        logging.error(f"Rejecting upload of {filename}: {e}")
+        remove_upload(upload_path)
+        return JSONResponse({"error": str(e)}, status_code=429)
 
     return JSONResponse(
-        {"message": "File processed successfully", "chunks": len(chunks)},
-        status_code=200
+        {
+            "message": "File queued for processing",
+            "job_id": job.id,
+            "collection": collection,
+            "status_url": f"/jobs/{job.id}",
+        },
+        status_code=202
     )
 
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id: {job_id}")
+    return JSONResponse(job.to_dict(), status_code=200)
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return JSONResponse({"status": "ok"}, status_code=200)
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: models and the default index are loaded and warm."""
+    warmup.start()
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Stage and request timings in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/collections")
+def list_collections():
+    return JSONResponse({"collections": collections.stats()}, status_code=200)
+
+@app.get("/documents")
+def list_documents(collection: str = None):
+    collection = resolve_collection(collection)
+    registry = collections.get(collection).registry
+    documents = [
+        {"document_id": file_hash, "filename": entry["filename"], "chunks": len(entry["chunks"])}
+        for file_hash, entry in list(registry.files.items())
+    ]
+    return JSONResponse({"collection": collection, "documents": documents}, status_code=200)
+
+@app.delete("/documents/{document_id}")
+async def delete_document(document_id: str, collection: str = None):
+    collection = resolve_collection(collection)
+    vector_store = await asyncio.to_thread(collections.get, collection)
+    result = await asyncio.to_thread(vector_store.delete_document, document_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document id: {document_id}")
+    logging.info(f"Deleted document {document_id} from collection {collection}.")
+    return JSONResponse({**result, "collection": collection}, status_code=200)
+
 @app.get("/", response_class=HTMLResponse) 
 async def home(request: Request): 
     logging.info("Rendering home page.")
     return templates.TemplateResponse("index.html", {"request": request})  
 
+SESSION_COOKIE = "session_id"
+
+
+def resolve_session_id(request: Request, session_id: str = None) -> str:
+    """Session ids come from the form, then the session cookie; new clients get a fresh one."""
+    return session_id or request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+
+
+def set_session_cookie(response, session_id: str):
+    response.set_cookie(SESSION_COOKIE, session_id, max_age=Config.SESSION_TTL_SECONDS, httponly=True, samesite="lax")
+
+
+answer_caches = {}
+
+
+def get_answer_cache(collection: str):
+    """One answer cache per collection, each following its own index version."""
+    if not Config.ANSWER_CACHE_ENABLED:
+        return None
+    if collection not in answer_caches:
+        answer_caches.setdefault(collection, SemanticAnswerCache(
+            collections.embeddings,
+            threshold=Config.ANSWER_CACHE_THRESHOLD,
+            max_entries=Config.ANSWER_CACHE_SIZE,
+        ))
+    return answer_caches[collection]
+
+
+async def lookup_answer(query: str, config: dict, no_cache: bool = False):
+    """Check the answer cache before running the graph.
+
+    Only the first turn of a thread is cached: later turns may depend on the
+    conversation so far. Returns the cached answer (or None) and the key to
+    store a freshly generated answer under (or None if it must not be cached).
+    A hit is recorded in the thread so follow-up questions see it.
+    """
+    collection = config["configurable"]["collection"]
+    answer_cache = get_answer_cache(collection)
+    if answer_cache is None:
+        return None, None
+    if no_cache:
+        answer_cache.bypass()
+        return None, None
+    state = await chatbot.aget_state(config)
+    if state.values.get("messages"):
+        return None, None
+
+    version = (await asyncio.to_thread(collections.get, collection)).version
+    vector = await asyncio.to_thread(answer_cache.embed, query)
+    answer = answer_cache.lookup(query, version, vector=vector)
+    if answer is not None:
+        await chatbot.aupdate_state(
+            config, {"messages": [HumanMessage(content=query), AIMessage(content=answer)]}, as_node="chat_node"
+        )
+    return answer, (answer_cache, version, vector)
+
+
+def store_answer(query: str, key, answer: str):
+    if key is not None and answer:
+        answer_cache, version, vector = key
+        answer_cache.store(query, version, answer, vector=vector)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    if not Config.ANSWER_CACHE_ENABLED:
+        return JSONResponse({"enabled": False}, status_code=200)
+    stats = {name: cache.stats() for name, cache in list(answer_caches.items())}
+    return JSONResponse({"enabled": True, "collections": stats}, status_code=200)
+
+
+async def answer_with_service(query: str, config: dict, collection: str, filter: dict = None) -> str:
+    """The ``LLmService`` pipeline instead of the graph. The turn is saved to
+    the same checkpointer, so sessions work the same with either."""
+    vector_store = await asyncio.to_thread(collections.get, collection)
+
+    def retrieve(text: str):
+        if vector_store.vector_store is None:
+            return []
+        return [doc for doc, _ in search_documents(vector_store, text, k=3, filter=filter)]
+
+    state = await chatbot.aget_state(config)
+    answer = await llm_service.agenerate(query, retrieve, history=state.values.get("messages", []))
+    await chatbot.aupdate_state(
+        config, {"messages": [HumanMessage(content=query), AIMessage(content=answer)]}, as_node="chat_node"
+    )
+    return answer
+
+
+async def answer_query(query: str, session_id: str, collection: str, filter: dict = None, no_cache: bool = False):
+    """Run one question through the graph (or the answer cache). Returns the
+    answer and whether it came from the cache."""
+    CONFIG = {"configurable": {"thread_id": session_id, "collection": collection, "filter": filter}}
+    ai_message, cache_key = await lookup_answer(query, CONFIG, no_cache or filter is not None)
+    cached = ai_message is not None
+    if not cached and Config.CHAT_PIPELINE == "service":
+        ai_message = await answer_with_service(query, CONFIG, collection, filter)
+        store_answer(query, cache_key, ai_message)
+    elif not cached:
+        initial_messages = [HumanMessage(content=query)]
+        initial_state = {"messages": initial_messages}
+        response= await chatbot.ainvoke(initial_state,config=CONFIG)
+        ai_message = response['messages'][-1].content
+        store_answer(query, cache_key, ai_message)
+    return ai_message, cached
+
+
 @app.post("/query")
-async def query_rag(query:str= form(...)):
+async def query_rag(request: Request, query:str= form(...), session_id: str = form(None), no_cache: bool = form(False),
+                    collection: str = form(None), filter: str = form(None)):
+    collection = resolve_collection(collection)
+    filter = parse_filter(filter)
     try:
         logging.info(f"Received query: {query}")
-        # llm_service=LLmService(vector_store,query)
         logging.info("Generating response from LLM service.")
 
-        initial_messages = [HumanMessage(content=query)]
-        initial_state = {"messages": initial_messages}
-        CONFIG = {"configurable": {"thread_id": "thread_1"}}
-        response= chatbot.invoke(initial_state,config=CONFIG)
-        ai_message = response['messages'][-1].content
-        return JSONResponse({"response": ai_message}, status_code=200)
+        session_id = resolve_session_id(request, session_id)
+        ai_message, cached = await answer_query(query, session_id, collection, filter, no_cache)
+        json_response = JSONResponse({"response": ai_message, "session_id": session_id, "cached": cached}, status_code=200)
+        set_session_cookie(json_response, session_id)
+        return json_response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {e}")
-    
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    collection: Optional[str] = None
+    filter: Optional[dict] = None
+    no_cache: bool = False
+
+
+def check_batch(queries: List[str]):
+    if not queries:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if len(queries) > Config.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {Config.BATCH_MAX_QUERIES} queries per batch")
+
+
+@app.post("/query/batch")
+async def query_rag_batch(body: BatchQueryRequest):
+    """Answer many independent questions, each in a new session, with at most
+    ``BATCH_CONCURRENCY`` graph runs at a time. Results come back in order; a
+    failed question gets an ``error`` instead of a ``response``."""
+    check_batch(body.queries)
+    collection = resolve_collection(body.collection)
+    logging.info(f"Received batch of {len(body.queries)} queries.")
+    # One forward pass for every question. The retrieval tool and the answer
+    # cache then find the embeddings in the query cache, as long as the model
+    # searches with the question as asked.
+    try:
+        await asyncio.to_thread(embed_queries, collections.embeddings, [q for q in body.queries if q.strip()])
+    except Exception as e:
+        logging.warning(f"Could not pre-embed batch queries: {e}")
+
+    semaphore = asyncio.Semaphore(Config.BATCH_CONCURRENCY)
+
+    async def answer(query: str) -> dict:
+        if not query.strip():
+            return {"query": query, "error": "Empty query"}
+        session_id = uuid.uuid4().hex
+        async with semaphore:
+            try:
+                ai_message, cached = await answer_query(query, session_id, collection, body.filter, body.no_cache)
+            except Exception as e:
+                logging.error(f"Batch query failed: {e}")
+                return {"query": query, "error": f"Error processing query: {e}"}
+        return {"query": query, "response": ai_message, "session_id": session_id, "cached": cached}
+
+    results = await asyncio.gather(*(answer(query) for query in body.queries))
+    return JSONResponse({"results": results}, status_code=200)
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _tool_output(output):
+    content = getattr(output, "content", output)
+    if isinstance(content, str):
+        try:
+            return json.loads(content)
+        except ValueError:
+            return content
+    return content
+
+
+async def stream_chat_events(query: str, session_id: str, collection: str, no_cache: bool = False, filter: dict = None):
+    """Run the graph and translate its events into SSE frames: tool_start,
+    retrieval (tool results), token (LLM output) and finally done or error.
+    A cached answer is sent as a single token frame."""
+    initial_state = {"messages": [HumanMessage(content=query)]}
+    CONFIG = {"configurable": {"thread_id": session_id, "collection": collection, "filter": filter}}
+    try:
+        answer, cache_key = await lookup_answer(query, CONFIG, no_cache or filter is not None)
+        if answer is not None:
+            yield sse_event("token", {"content": answer})
+            yield sse_event("done", {"cached": True})
+            return
+        async for event in chatbot.astream_events(initial_state, config=CONFIG, version="v2"):
+            kind = event["event"]
+            if SUMMARY_TAG in event.get("tags", []):
+                continue
+            if kind == "on_chat_model_stream":
+                token = event["data"]["chunk"].content
+                if token:
+                    yield sse_event("token", {"content": token})
+            elif kind == "on_tool_start":
+                yield sse_event("tool_start", {"name": event["name"], "input": event["data"].get("input")})
+            elif kind == "on_tool_end":
+                yield sse_event("retrieval", {"name": event["name"], "output": _tool_output(event["data"].get("output"))})
+        if cache_key is not None:
+            state = await chatbot.aget_state(CONFIG)
+            store_answer(query, cache_key, state.values["messages"][-1].content)
+        yield sse_event("done", {"cached": False})
+    except Exception as e:
+        logging.error(f"Error streaming query: {e}")
+        yield sse_event("error", {"detail": f"Error processing query: {e}"})
+
+
+@app.post("/query/stream")
+async def query_rag_stream(request: Request, query: str = form(...), session_id: str = form(None),
+                           no_cache: bool = form(False), collection: str = form(None), filter: str = form(None)):
+    logging.info(f"Received streaming query: {query}")
+    collection = resolve_collection(collection)
+    filter = parse_filter(filter)
+    session_id = resolve_session_id(request, session_id)
+    response = StreamingResponse(
+        stream_chat_events(query, session_id, collection, no_cache, filter),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    set_session_cookie(response, session_id)
+    return response
+
+
+reranker = CrossEncoderReranker(
+    Config.RERANK_MODEL,
+    max_candidates=Config.RERANK_MAX_CANDIDATES,
+    min_score=Config.RERANK_MIN_SCORE,
+    latency_budget_ms=Config.RERANK_LATENCY_BUDGET_MS,
+    max_length=Config.RERANK_MAX_LENGTH,
+)
+
+
+def search_documents(vector_store, query: str, k: int, mode: str = None, filter: dict = None, rerank: bool = None):
+    """First-stage search, then the cross-encoder when reranking is on.
+    Returns ``(document, rerank score or None)`` pairs."""
+    if rerank is None:
+        rerank = Config.RERANK_ENABLED
+    if not rerank:
+        with span("retrieval"):
+            return [(doc, None) for doc in vector_store.search(query, k=k, mode=mode, filter=filter)]
+    with span("retrieval"):
+        candidates = vector_store.search(query, k=max(k, Config.RERANK_FETCH_K), mode=mode, filter=filter)
+    with span("rerank"):
+        return reranker.rerank(query, candidates, k=k)
+
+
+def search_documents_batch(vector_store, queries: List[str], k: int, mode: str = None, filter: dict = None,
+                           rerank: bool = None):
+    """``search_documents`` for many queries with one batched first stage.
+    Returns, per query, its ``(document, score)`` pairs or the exception the
+    rerank raised for it."""
+    if rerank is None:
+        rerank = Config.RERANK_ENABLED
+    with span("retrieval"):
+        batches = vector_store.search_batch(queries, k=max(k, Config.RERANK_FETCH_K) if rerank else k,
+                                            mode=mode, filter=filter)
+    if not rerank:
+        return [[(doc, None) for doc in documents] for documents in batches]
+    results = []
+    for query, candidates in zip(queries, batches):
+        try:
+            with span("rerank"):
+                results.append(reranker.rerank(query, candidates, k=k))
+        except Exception as e:
+            results.append(e)
+    return results
+
 
 @app.get("/vectorstore_result")
-def vectorstore_result(query: str):
+def vectorstore_result(query: str, mode: str = None, collection: str = None, filter: str = None,
+                       rerank: bool = None):
+    collection = resolve_collection(collection)
+    filter = parse_filter(filter)
     try:
-        results = vector_store.similarity_search(query, k=4)
+        results = search_documents(collections.get(collection), query, k=4, mode=mode, filter=filter, rerank=rerank)
         formatted_results = [
-            {"page_content": doc.page_content, "metadata": doc.metadata} for doc in results
+            {"page_content": doc.page_content, "metadata": doc.metadata, "rerank_score": score}
+            for doc, score in results
         ]
         return JSONResponse({"results": formatted_results}, status_code=200)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during similarity search: {e}")
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    mode: Optional[str] = None
+    collection: Optional[str] = None
+    filter: Optional[dict] = None
+    rerank: Optional[bool] = None
+
+
+@app.post("/vectorstore_result/batch")
+def vectorstore_result_batch(body: BatchSearchRequest):
+    """Search for many queries at once. Results come back in order; a query
+    that failed gets an ``error`` instead of ``results``."""
+    check_batch(body.queries)
+    collection = resolve_collection(body.collection)
+    queries = [query for query in body.queries if query.strip()]
+    try:
+        found = dict(zip(queries, search_documents_batch(
+            collections.get(collection), queries, k=4, mode=body.mode, filter=body.filter, rerank=body.rerank
+        )))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during similarity search: {e}")
+
+    items = []
+    for query in body.queries:
+        result = found.get(query)
+        if result is None:
+            items.append({"query": query, "error": "Empty query"})
+        elif isinstance(result, Exception):
+            items.append({"query": query, "error": f"Error during rerank: {result}"})
+        else:
+            items.append({"query": query, "results": [
+                {"page_content": doc.page_content, "metadata": doc.metadata, "rerank_score": score}
+                for doc, score in result
+            ]})
+    return JSONResponse({"results": items}, status_code=200)
     
 
 
@@ -152,16 +589,21 @@ llm = ChatGroq(
         api_key=Config.qroq_api_key,
         )
 
+llm_service = LLmService(
+    llm,
+    refine=Config.QUERY_REFINEMENT,
+    refine_cache_size=Config.REFINEMENT_CACHE_SIZE,
+    history_messages=Config.SERVICE_HISTORY_MESSAGES,
+)
+
 class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    summary: str
 
 
 
-@tool
-def retrieval(query: str) -> List[dict]:
-    """
-    Retrieve relevant information from the uploaded PDF(s).
-    """
+def _retrieve(query: str, collection: str = None, filter: dict = None) -> dict:
+    vector_store = collections.get(collection)
     if vector_store.vector_store is None:
         return {
             "error": "No document indexed for this chat. Upload a PDF first.",
@@ -169,14 +611,12 @@ def retrieval(query: str) -> List[dict]:
         }
 
     try:
-        retr = vector_store.vector_store.as_retriever(search_kwargs={"k": 3})
-        docs = retr.invoke(query)  
-    except Exception:
-
-        docs = vector_store.similarity_search(query, k=3)
+        results = search_documents(vector_store, query, k=3, filter=filter)
+    except ValueError as e:
+        return {"error": f"Invalid filter: {e}", "query": query}
 
-    context = [getattr(d, "page_content", str(d)) for d in docs]
-    metadata = [getattr(d, "metadata", {}) for d in docs]
+    context = [getattr(d, "page_content", str(d)) for d, _ in results]
+    metadata = [getattr(d, "metadata", {}) for d, _ in results]
 
     return {
         "query": query,
@@ -185,31 +625,57 @@ def retrieval(query: str) -> List[dict]:
     }
 
 
+@tool
+async def retrieval(query: str, config: RunnableConfig, filter: Optional[dict] = None) -> List[dict]:
+    """
+    Retrieve relevant information from the uploaded PDF(s).
+
+    `filter` optionally restricts the search by metadata, e.g.
+    {"filename": "report.pdf", "page": {"$gte": 3, "$lte": 10}}. Fields:
+    filename, document_id, source, page, uploaded_at (epoch seconds or ISO
+    date); operators: $eq, $neq, $gt, $gte, $lt, $lte, $in, $nin, $and, $or, $not.
+    """
+    # The collection in scope comes from the graph config, not from the model.
+    configurable = config.get("configurable", {})
+    collection = configurable.get("collection")
+    # A filter set on the request always applies, on top of the model's own.
+    filters = [f for f in (configurable.get("filter"), filter) if f]
+    filter = {"$and": filters} if len(filters) > 1 else (filters[0] if filters else None)
+    # Query embedding and the FAISS search are blocking; keep them off the event loop.
+    return await asyncio.to_thread(_retrieve, query, collection, filter)
+
+
 tools=[retrieval]
 
 llm_with_tool=llm.bind_tools(tools)
 
-def chat_node(state: ChatState):
+context_window = ContextWindow(
+    max_tokens=Config.CONTEXT_MAX_TOKENS,
+    tool_output_chars=Config.CONTEXT_TOOL_OUTPUT_CHARS,
+    summarize=Config.CONTEXT_SUMMARIZE,
+    summary_words=Config.CONTEXT_SUMMARY_WORDS,
+)
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant. When the user asks about the uploaded document, "
+    "use the retriever tool to fetch relevant document passages. "
+    "The retrieval tool returns a list of objects with 'page_content' and 'metadata'. "
+    "If there are no documents available, ask the user to upload the PDF. "
+    "If you genuinely do not know the answer, say you don't know."
+)
+
+async def chat_node(state: ChatState):
     """LLM node that may answer or request a tool call."""
 
-    system_message = SystemMessage(
-        content=(
-        "You are a helpful assistant. When the user asks about the uploaded document, "
-        "use the retriever tool to fetch relevant document passages. "
-        "The retrieval tool returns a list of objects with 'page_content' and 'metadata'. "
-        "If there are no documents available, ask the user to upload the PDF. "
-        "If you genuinely do not know the answer, say you don't know."
-        )
+    messages, update = await context_window.prepare(
+        SYSTEM_PROMPT, state['messages'], summary=state.get('summary', ''), llm=llm
     )
-
-    messages = [system_message,*state['messages']]
-    response = llm_with_tool.invoke(messages)
-    return {"messages": [response]}
+    with span("llm"):
+        response = await llm_with_tool.ainvoke(messages)
+    return {**update, "messages": [*update.get("messages", []), response]}
 
 tool_node = ToolNode(tools)
 
-checkpointer = InMemorySaver()
-
 graph = StateGraph(ChatState)
 graph.add_node("chat_node", chat_node)
 graph.add_node("tools", tool_node)
@@ -219,7 +685,57 @@ graph.add_edge(START, "chat_node")
 graph.add_conditional_edges("chat_node",tools_condition)
 graph.add_edge('tools', 'chat_node')
 
-chatbot = graph.compile(checkpointer=checkpointer)
+# Compiled in the startup hook: the SQLite saver binds to the running event loop.
+checkpointer = None
+chatbot = None
+
+
+def warm_embeddings():
+    collections.embeddings.embed_query("warmup")
+
+
+def warm_index():
+    vector_store = collections.get()
+    if vector_store.vector_store is not None:
+        vector_store.search("warmup", k=1)
+
+
+def warm_reranker():
+    if Config.RERANK_ENABLED:
+        reranker.model  # loads the cross-encoder
+
+
+warmup = Warmup(
+    [("embeddings", warm_embeddings), ("index", warm_index), ("reranker", warm_reranker)],
+    started_at=IMPORT_STARTED,
+    retry_delay=Config.WARMUP_RETRY_DELAY,
+    max_retry_delay=Config.WARMUP_RETRY_MAX_DELAY,
+)
+warmup.import_seconds = round(time.perf_counter() - IMPORT_STARTED, 4)
+logging.info(f"app.main imported in {warmup.import_seconds}s.")
+
+
+@app.on_event("startup")
+async def open_checkpointer():
+    global checkpointer, chatbot
+    checkpointer = create_checkpointer()
+    chatbot = graph.compile(checkpointer=checkpointer)
+
+
+@app.on_event("startup")
+async def start_warmup():
+    # In the background: the server accepts requests (and answers /healthz)
+    # right away, and /readyz turns 200 once this is done.
+    if Config.WARMUP_ON_STARTUP:
+        warmup.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_checkpointer():
+    global checkpointer, chatbot
+    if checkpointer is not None:
+        await close_checkpointer(checkpointer)
+    checkpointer = chatbot = None
 
 
     
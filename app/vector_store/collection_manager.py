@@ -0,0 +1,113 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+from app.vector_store.vector_store import VectorStore, build_embeddings
+from app.config import Config
+from app.logger import logging
+
+COLLECTION_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class InvalidCollectionError(ValueError):
+    """Raised for collection names that are not safe to use as a directory."""
+
+
+class CollectionNotFoundError(KeyError):
+    """Raised when reading from a collection nothing was ever uploaded to."""
+
+
+class CollectionManager:
+    """Named, independent vector stores (one per tenant or chat).
+
+    The default collection lives at ``root`` itself, so stores created before
+    collections existed keep working; the others live under
+    ``root/collections/<name>``. All collections share one embedding model and
+    embedding cache. A collection's index is loaded on first use, and once the
+    loaded collections together exceed ``memory_budget`` bytes the least
+    recently used ones are unloaded until they fit again.
+    """
+
+    def __init__(self, root: str = "faiss_store", memory_budget: int = 0, default: str = "default"):
+        self.root = root
+        self.memory_budget = memory_budget
+        self.default = default
+        os.makedirs(os.path.join(root, "collections"), exist_ok=True)
+        self.embeddings = build_embeddings(root)
+        self._stores = {}
+        self._recent = OrderedDict()  # names of collections in use, least recent first
+        self._lock = threading.Lock()
+
+    def resolve(self, name: str = None) -> str:
+        name = name or self.default
+        if not COLLECTION_NAME_RE.match(name):
+            raise InvalidCollectionError(
+                f"Invalid collection name {name!r}: use 1-64 letters, digits, '-' or '_'"
+            )
+        return name
+
+    def path(self, name: str) -> str:
+        return self.root if name == self.default else os.path.join(self.root, "collections", name)
+
+    def exists(self, name: str) -> bool:
+        return name == self.default or name in self._stores or os.path.isdir(self.path(name))
+
+    def names(self) -> List[str]:
+        return sorted({self.default, *os.listdir(os.path.join(self.root, "collections")), *self._stores})
+
+    def get(self, name: str = None, create: bool = False) -> VectorStore:
+        """Return the collection's store with its index loaded, marking it as
+        most recently used. Unknown collections raise
+        ``CollectionNotFoundError`` unless ``create`` is set."""
+        name = self.resolve(name)
+        with self._lock:
+            store = self._stores.get(name)
+            if store is None:
+                if not create and not self.exists(name):
+                    raise CollectionNotFoundError(f"Unknown collection: {name}")
+                logging.info(f"Opening collection {name!r} at {self.path(name)}")
+                store = self._stores[name] = VectorStore(self.path(name), embeddings=self.embeddings)
+
+        was_loaded = store.loaded
+        store.vector_store  # loads the index on first use
+        with self._lock:
+            self._recent[name] = store
+            self._recent.move_to_end(name)
+        if not was_loaded and store.loaded:
+            self.enforce_budget(keep=name)
+        return store
+
+    def enforce_budget(self, keep: str = None):
+        """Unload least recently used collections until the loaded ones fit in
+        the memory budget. ``keep`` and collections busy ingesting are skipped."""
+        if not self.memory_budget:
+            return
+        with self._lock:
+            recent = list(self._recent.items())
+        total = sum(store.memory_bytes() for _, store in recent)
+        for name, store in recent:
+            if total <= self.memory_budget:
+                break
+            if name == keep:
+                continue
+            size = store.memory_bytes()
+            if store.unload(blocking=False):
+                total -= size
+                with self._lock:
+                    self._recent.pop(name, None)
+                logging.info(f"Unloaded collection {name!r} ({size} bytes) to stay within the memory budget.")
+        if total > self.memory_budget:
+            logging.info(f"Loaded collections use {total} bytes, over the {self.memory_budget} byte budget.")
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            stores = dict(self._stores)
+        return [
+            {
+                "name": name,
+                "loaded": name in stores and stores[name].loaded,
+                "memory_bytes": stores[name].memory_bytes() if name in stores else 0,
+            }
+            for name in self.names()
+        ]
@@ -0,0 +1,138 @@
+import bisect
+import json
+import mmap
+import os
+from typing import Dict, List, Union
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+from app.vector_store.metadata_store import MetadataColumns
+
+
+def write_docs(f, ids: List[str], documents: List[Document]) -> np.ndarray:
+    """Write documents as JSON lines and return the byte offset of each line,
+    plus the end of the file."""
+    offsets = [0]
+    for id_, doc in zip(ids, documents):
+        record = {"id": id_, "page_content": doc.page_content, "metadata": doc.metadata}
+        offsets.append(offsets[-1] + f.write(json.dumps(record, default=str).encode("utf-8") + b"\n"))
+    return np.asarray(offsets, dtype=np.int64)
+
+
+def write_docs_index(f, ids: List[str], offsets: np.ndarray, columns: MetadataColumns):
+    """The ``.docs.idx.npz`` of a segment: line offsets, ids and filterable
+    metadata, which is all a load needs; texts stay in the JSON lines file."""
+    np.savez(
+        f,
+        offsets=offsets,
+        ids=np.frombuffer("\n".join(ids).encode("utf-8"), dtype=np.uint8),
+        **columns.to_arrays(),
+    )
+
+
+def index_docs_file(path: str):
+    """Offsets, ids and metadata columns of an existing JSON lines file."""
+    offsets, ids, metadatas = [0], [], []
+    with open(path, "rb") as f:
+        for line in f:
+            record = json.loads(line)
+            offsets.append(offsets[-1] + len(line))
+            ids.append(record["id"])
+            metadatas.append(record["metadata"])
+    return ids, np.asarray(offsets, dtype=np.int64), MetadataColumns(metadatas)
+
+
+class DocsSegment:
+    """The documents of one segment, read on demand from a memory-mapped JSON
+    lines file through its offsets index."""
+
+    def __init__(self, docs_path: str, index_path: str):
+        with np.load(index_path) as data:
+            self.offsets = data["offsets"]
+            ids = data["ids"].tobytes().decode("utf-8")
+            self.columns = MetadataColumns.from_arrays(data)
+        self.ids = ids.split("\n") if ids else []
+        self._mmap = None
+        if self.offsets[-1]:
+            with open(docs_path, "rb") as f:
+                # The mapping stays valid after the file is closed, or removed
+                # by a compaction, until this segment is dropped.
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes
+
+    def get(self, row: int) -> Document:
+        record = json.loads(self._mmap[self.offsets[row]:self.offsets[row + 1]])
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def texts(self) -> List[str]:
+        return [self.get(row).page_content for row in range(len(self))]
+
+
+class SegmentDocstore(Docstore, AddableMixin):
+    """Docstore over ``DocsSegment``s, so chunk texts are read from disk only
+    for the hits a search returns instead of all being held in memory.
+
+    Documents added since the last segment was attached are kept in memory
+    until ``attach`` is called with the segment they were written to.
+    Metadata changed after a document was written is applied on read.
+    """
+
+    def __init__(self):
+        self._segments: List[DocsSegment] = []
+        self._starts: List[int] = []
+        self._rows: Dict[str, int] = {}
+        self._recent: Dict[str, Document] = {}
+        self._metadata: Dict[str, dict] = {}
+
+    def attach(self, segment: DocsSegment, start: int, tombstones=()):
+        """Serve the documents of ``segment``, whose first row is ``start``,
+        from disk; rows in ``tombstones`` are left out."""
+        self._segments.append(segment)
+        self._starts.append(start)
+        for row, id_ in enumerate(segment.ids, start):
+            self._recent.pop(id_, None)
+            if row not in tombstones:
+                self._rows[id_] = row
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self._segments) + sum(len(d.page_content) for d in self._recent.values())
+
+    def search(self, search: str) -> Union[str, Document]:
+        doc = self._recent.get(search)
+        if doc is None:
+            row = self._rows.get(search)
+            if row is None:
+                return f"ID {search} not found."
+            i = bisect.bisect_right(self._starts, row) - 1
+            doc = self._segments[i].get(row - self._starts[i])
+        if search in self._metadata:
+            doc.metadata.update(self._metadata[search])
+        return doc
+
+    def update_metadata(self, updates: Dict[str, dict]) -> None:
+        """Merge ``updates`` (id -> metadata fields) into the documents' metadata."""
+        for id_, metadata in updates.items():
+            self._metadata.setdefault(id_, {}).update(metadata)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        overlapping = [id_ for id_ in texts if id_ in self._rows or id_ in self._recent]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._recent.update(texts)
+
+    def delete(self, ids: List) -> None:
+        for id_ in ids:
+            self._rows.pop(id_, None)
+            self._recent.pop(id_, None)
+            self._metadata.pop(id_, None)
+
+
+def docs_paths(directory: str, name: str):
+    return os.path.join(directory, f"{name}.docs.jsonl"), os.path.join(directory, f"{name}.docs.idx.npz")
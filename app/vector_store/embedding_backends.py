@@ -0,0 +1,76 @@
+import os
+import numpy as np
+from app.logger import logging
+
+# SentenceTransformer arguments per backend. The ONNX ones need
+# ``pip install sentence-transformers[onnx]``; the exported models ship with
+# the sentence-transformers checkpoints on the Hugging Face hub.
+BACKENDS = {
+    "torch": {},
+    "onnx": {"backend": "onnx"},
+    "onnx-int8": {"backend": "onnx", "model_kwargs": {"file_name": "onnx/model_quint8_avx2.onnx"}},
+}
+
+# Fixed sentences embedded by every backend to check their vectors agree.
+PROBE_TEXTS = [
+    "The quarterly report shows revenue growth of 12 percent.",
+    "Replace the filter cartridge every six months.",
+    "Part number AB-1234/5 is compatible with model X200.",
+    "What is the warranty period for this product?",
+    "The patient should take the medication twice daily with food.",
+    "Section 4.2 describes the termination clause of the contract.",
+    "Install the package and restart the service.",
+    "Heavy rainfall is expected across the northern region tomorrow.",
+]
+PROBES_FILE = "probes.npz"
+
+
+class EmbeddingCompatibilityError(RuntimeError):
+    """Raised when a backend's vectors are too far from the ones the index was built with."""
+
+
+def model_kwargs(backend: str, model_file: str = None) -> dict:
+    """SentenceTransformer keyword arguments selecting ``backend``, optionally
+    with a specific exported model file (e.g. ``onnx/model_qint8_avx512.onnx``)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    kwargs = {**BACKENDS[backend]}
+    if model_file:
+        kwargs["model_kwargs"] = {"file_name": model_file}
+    return kwargs
+
+
+def _unit(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def check_compatibility(embed_documents, directory: str, backend: str, tolerance: float) -> float:
+    """Embed ``PROBE_TEXTS`` and compare them with the probe vectors recorded
+    in ``directory`` by the first backend that embedded into it.
+
+    Returns the lowest cosine similarity and raises
+    ``EmbeddingCompatibilityError`` if it is below ``tolerance``, since
+    vectors from that backend could not be mixed with those already indexed
+    and cached. The first backend to run records the reference.
+    """
+    vectors = _unit(embed_documents(PROBE_TEXTS))
+    path = os.path.join(directory, PROBES_FILE)
+    if not os.path.exists(path):
+        np.savez(path, backend=np.array(backend), vectors=vectors)
+        return 1.0
+
+    with np.load(path) as data:
+        reference_backend, reference = str(data["backend"]), data["vectors"]
+    if reference.shape != vectors.shape:
+        raise EmbeddingCompatibilityError(
+            f"Backend {backend!r} produces {vectors.shape[1]}-d vectors, the index uses {reference.shape[1]}-d."
+        )
+    similarity = float((vectors * reference).sum(axis=1).min())
+    if similarity < tolerance:
+        raise EmbeddingCompatibilityError(
+            f"Backend {backend!r} is not compatible with {reference_backend!r} vectors in {directory}: "
+            f"cosine similarity {similarity:.4f} < {tolerance}."
+        )
+    logging.info(f"Embedding backend {backend!r} matches {reference_backend!r} (min cosine {similarity:.4f}).")
+    return similarity
@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.vector_store.hash_registry import chunk_hash
+from app.logger import logging
+from app.metrics.registry import span
+
+
+class EmbeddingCache:
+    """Append-only, memory-mapped float32 store of embeddings keyed by text hash.
+
+    Vectors live in ``vectors.f32`` (one row per entry) and their keys in
+    ``keys.txt`` (one hash per line, same order). Vectors are always written
+    before keys, so a crash can only leave orphan rows, which are truncated on
+    load. Keys are read on the first lookup or write rather than on
+    construction, which happens at import. One directory is kept per model so
+    vectors from different models never mix.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        self.dir = os.path.join(path, "embedding_cache", re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.keys_path = os.path.join(self.dir, "keys.txt")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self._lock = threading.Lock()
+        self._rows = None
+        self._mmap = None
+        self.dim = None
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+
+    def _ensure_loaded(self):
+        """Build the key map on first use. Called with the lock held."""
+        if self._rows is not None:
+            return
+        if self.dim is None:
+            self._rows = {}
+            return
+        keys = []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                keys = [line.strip() for line in f if line.strip()]
+        row_bytes = self.dim * 4
+        stored_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        rows = min(len(keys), stored_rows)
+        if rows != len(keys) or rows != stored_rows:
+            logging.info(f"Truncating embedding cache at {self.dir} to {rows} consistent rows.")
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(rows * row_bytes)
+            with open(self.keys_path, "w", encoding="utf-8") as f:
+                f.writelines(k + "\n" for k in keys[:rows])
+        self._rows = {k: i for i, k in enumerate(keys[:rows])}
+        logging.info(f"Loaded embedding cache with {rows} vectors from {self.dir}")
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._rows)
+
+    def _matrix(self):
+        if self._mmap is None and self._rows:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dim))
+        return self._mmap
+
+    def get_many(self, keys) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            found = {k: self._rows[k] for k in keys if k in self._rows}
+            if not found:
+                return {}
+            matrix = self._matrix()
+            return {k: np.array(matrix[row]) for k, row in found.items()}
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._ensure_loaded()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            new = [(k, v) for k, v in zip(keys, vectors) if k not in self._rows]
+            if not new:
+                return
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack([v for _, v in new]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.writelines(k + "\n" for k, _ in new)
+            for k, _ in new:
+                self._rows[k] = len(self._rows)
+            self._mmap = None
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed ``texts`` as queries, in one call when ``embeddings`` can batch them."""
+    batched = getattr(embeddings, "embed_queries", None)
+    if batched is not None:
+        return batched(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that consults an ``EmbeddingCache`` before the model.
+
+    Document embeddings are written through to the disk cache. Query embeddings
+    are looked up there too, but are only kept in a small in-process LRU so
+    one-off queries do not grow the cache on disk.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, query_cache_size: int = 1024):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.query_cache_size = query_cache_size
+        self._query_lru = OrderedDict()
+        self._lru_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [chunk_hash(t) for t in texts]
+        cached = self.cache.get_many(keys)
+        missing = {k: t for k, t in zip(keys, texts) if k not in cached}
+        logging.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses.")
+        if missing:
+            miss_keys = list(missing)
+            vectors = self.embeddings.embed_documents([missing[k] for k in miss_keys])
+            self.cache.put_many(miss_keys, vectors)
+            cached.update(zip(miss_keys, np.asarray(vectors, dtype=np.float32)))
+        return [cached[k].tolist() for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = chunk_hash(text)
+        with self._lru_lock:
+            if key in self._query_lru:
+                self._query_lru.move_to_end(key)
+                return self._query_lru[key]
+
+        cached = self.cache.get_many([key])
+        if cached:
+            vector = cached[key].tolist()
+        else:
+            with span("embed_query"):
+                vector = self.embeddings.embed_query(text)
+
+        with self._lru_lock:
+            self._query_lru[key] = vector
+            if len(self._query_lru) > self.query_cache_size:
+                self._query_lru.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """``embed_query`` for many texts; the misses go through the model in
+        one batch instead of one forward pass each."""
+        keys = [chunk_hash(t) for t in texts]
+        vectors = {}
+        with self._lru_lock:
+            for key in keys:
+                if key in self._query_lru:
+                    self._query_lru.move_to_end(key)
+                    vectors[key] = self._query_lru[key]
+        missing = [k for k in dict.fromkeys(keys) if k not in vectors]
+        if missing:
+            vectors.update((k, v.tolist()) for k, v in self.cache.get_many(missing).items())
+            missing = [k for k in missing if k not in vectors]
+        if missing:
+            texts_by_key = dict(zip(keys, texts))
+            with span("embed_query"):
+                computed = embed_queries(self.embeddings, [texts_by_key[k] for k in missing])
+            vectors.update(zip(missing, [list(map(float, v)) for v in computed]))
+
+        with self._lru_lock:
+            for key in dict.fromkeys(keys):
+                self._query_lru[key] = vectors[key]
+                self._query_lru.move_to_end(key)
+            while len(self._query_lru) > self.query_cache_size:
+                self._query_lru.popitem(last=False)
+        return [vectors[k] for k in keys]
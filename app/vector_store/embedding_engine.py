@@ -0,0 +1,83 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.vector_store import embedding_worker
+from app.vector_store.embedding_cache import embed_queries
+from app.logger import logging
+
+
+class EmbeddingEngine(Embeddings):
+    """Batched document embedding fanned out over a process pool.
+
+    Each worker holds its own copy of the sentence-transformers model with its
+    torch/BLAS thread count pinned to ``cpu_count // workers``, so the pool uses
+    every core without oversubscribing them. Small inputs, queries and
+    ``workers <= 1`` stay on the in-process ``embeddings``.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, workers: int = 0, batch_size: int = 64,
+                 model_kwargs: dict = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.model_kwargs = model_kwargs or {}
+        self.workers = workers
+        self.batch_size = batch_size
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                logging.info(f"Starting embedding pool: {self.workers} workers x {threads} threads, batch size {self.batch_size}")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=embedding_worker.init_worker,
+                    initargs=(self.model_name, threads, self.model_kwargs),
+                )
+                atexit.register(self.shutdown)
+            return self._pool
+
+    def iter_embeddings(self, texts: List[str]) -> Iterator[np.ndarray]:
+        """Yield one array of vectors per batch, in input order. At most two
+        batches per worker are in flight, so memory stays bounded for large
+        inputs."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.workers <= 1 or len(batches) <= 1:
+            for batch in batches:
+                yield np.asarray(self.embeddings.embed_documents(batch), dtype=np.float32)
+            return
+
+        pool = self._get_pool()
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(embedding_worker.encode_batch, batch))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return np.concatenate(list(self.iter_embeddings(texts))).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Query batches are small; the pool would only add transfer overhead.
+        return embed_queries(self.embeddings, texts)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,25 @@
+"""Process-pool side of ``EmbeddingEngine``.
+
+Kept free of ``app`` imports so spawned workers only load what they need.
+"""
+import os
+
+_model = None
+
+
+def init_worker(model_name: str, threads: int, model_kwargs: dict = None):
+    # Must run before torch is imported so the BLAS/OpenMP pools are sized once.
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    global _model
+    _model = SentenceTransformer(model_name, device="cpu", **(model_kwargs or {}))
+
+
+def encode_batch(texts):
+    return _model.encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
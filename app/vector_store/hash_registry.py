@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import threading
+from app.logger import logging
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class HashRegistry:
+    """Persistent registry of the file and chunk content hashes already indexed.
+
+    Files are keyed by the SHA-256 of their bytes, chunks by the SHA-256 of their
+    text. Chunk hashes double as docstore ids, and each chunk keeps a reference
+    count of the files that contain it.
+
+    Changes are appended to ``hash_registry.log`` as numbered records on
+    ``save``, so an upload or delete writes only what it changed.
+    ``checkpoint`` (run by compaction) folds them into the
+    ``hash_registry.json`` snapshot, which records the last record it holds;
+    records up to that one are skipped when the log is replayed on load.
+    """
+
+    FILENAME = "hash_registry.json"
+    JOURNAL = "hash_registry.log"
+
+    def __init__(self, path: str):
+        self.file_path = os.path.join(path, self.FILENAME)
+        self.journal_path = os.path.join(path, self.JOURNAL)
+        self._lock = threading.Lock()
+        self.files = {}
+        self.chunks = {}
+        self._seq = 0
+        self._pending = []
+        # chunk hash -> the files containing it, in registration order; built
+        # on the first ``owners`` call and kept up to date from then on.
+        self._owners = None
+        if os.path.exists(self.file_path):
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.chunks = data.get("chunks", {})
+            self._seq = data.get("seq", 0)
+        replayed = self._replay()
+        if self.files or self.chunks:
+            logging.info(f"Loaded hash registry with {len(self.files)} files and {len(self.chunks)} chunks "
+                         f"({replayed} logged changes).")
+
+    def _replay(self) -> int:
+        if not os.path.exists(self.journal_path):
+            return 0
+        replayed = 0
+        with open(self.journal_path, "r+b") as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A record torn by a crash mid-write was never saved; cut it
+                    # off so later appends are not stranded behind it.
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                if record["seq"] > self._seq:
+                    self._apply(record)
+                    self._seq = record["seq"]
+                    replayed += 1
+        return replayed
+
+    def _record(self, record: dict):
+        """Apply a change and queue it for the next ``save``. Called with the lock held."""
+        self._seq += 1
+        record["seq"] = self._seq
+        self._pending.append(record)
+        return self._apply(record)
+
+    def _apply(self, record: dict):
+        op = record["op"]
+        if op == "register_file":
+            entry = {"filename": record["filename"], "chunks": record["chunks"]}
+            if record.get("uploaded_at") is not None:
+                entry["uploaded_at"] = record["uploaded_at"]
+            self.files[record["file"]] = entry
+            for h in record["chunks"]:
+                self.chunks[h] = self.chunks.get(h, 0) + 1
+            if self._owners is not None:
+                for h in record["chunks"]:
+                    self._owners.setdefault(h, {})[record["file"]] = None
+        elif op == "unregister_file":
+            entry = self.files.pop(record["file"], None)
+            if entry is None:
+                return []
+            released = []
+            for h in dict.fromkeys(entry["chunks"]):
+                if self._owners is not None:
+                    files = self._owners.get(h, {})
+                    files.pop(record["file"], None)
+                    if not files:
+                        self._owners.pop(h, None)
+                count = self.chunks.get(h, 0) - 1
+                if count > 0:
+                    self.chunks[h] = count
+                else:
+                    self.chunks.pop(h, None)
+                    released.append(h)
+            return released
+        elif op == "register_chunks":
+            for h in record["chunks"]:
+                self.chunks[h] = self.chunks.get(h, 0) + 1
+
+    def has_file(self, file_hash: str) -> bool:
+        return file_hash in self.files
+
+    def get_file(self, file_hash: str):
+        return self.files.get(file_hash)
+
+    def has_chunk(self, hash_: str) -> bool:
+        return hash_ in self.chunks
+
+    def register_file(self, file_hash: str, filename: str, chunk_hashes, uploaded_at: float = None):
+        """Register a file and count a reference to each of its chunks. A file
+        already registered is left as is, so its references are never counted twice."""
+        with self._lock:
+            if file_hash in self.files:
+                return
+            self._record({"op": "register_file", "file": file_hash, "filename": filename,
+                          "chunks": list(chunk_hashes), "uploaded_at": uploaded_at})
+
+    def unregister_file(self, file_hash: str):
+        """Forget a file and return the hashes of its chunks no other file
+        references any more."""
+        with self._lock:
+            if file_hash not in self.files:
+                return []
+            return self._record({"op": "unregister_file", "file": file_hash})
+
+    def owners(self, chunk_hashes):
+        """The most recently registered file containing each of ``chunk_hashes``,
+        for those any file still contains."""
+        with self._lock:
+            if self._owners is None:
+                self._owners = {}
+                for file_hash, entry in self.files.items():
+                    for h in entry["chunks"]:
+                        self._owners.setdefault(h, {})[file_hash] = None
+            owners = {}
+            for h in chunk_hashes:
+                files = self._owners.get(h)
+                if files:
+                    owners[h] = next(reversed(files))
+            return owners
+
+    def files_named(self, filename: str):
+        with self._lock:
+            return [file_hash for file_hash, entry in self.files.items() if entry["filename"] == filename]
+
+    def register_chunks(self, chunk_hashes):
+        with self._lock:
+            self._record({"op": "register_chunks", "chunks": list(chunk_hashes)})
+
+    def save(self):
+        """Append the changes made since the last save to the log."""
+        with self._lock:
+            if not self._pending:
+                return
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in self._pending)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending = []
+
+    def checkpoint(self):
+        """Write the whole registry as the new snapshot and empty the log."""
+        with self._lock:
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"files": self.files, "chunks": self.chunks, "seq": self._seq}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.file_path)
+            # Safe to drop now: the snapshot's seq covers every record in it.
+            open(self.journal_path, "w").close()
+            self._pending = []
@@ -0,0 +1,116 @@
+import math
+import faiss
+import numpy as np
+from app.logger import logging
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq")
+
+
+def default_nlist(num_vectors: int) -> int:
+    # Rule of thumb: ~4 * sqrt(N) lists, keeping at least 39 training points per list.
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def default_pq_m(dim: int) -> int:
+    # Aim for ~8 dimensions per sub-quantizer; m must divide dim.
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def min_train_vectors(index_type: str, nlist: int = 0) -> int:
+    if index_type not in TRAINED_INDEX_TYPES:
+        return 0
+    # k-means wants ~39 points per centroid: nlist for IVF, 256 per 8-bit PQ codebook.
+    return 39 * max(nlist or 1, 256 if index_type == "ivf_pq" else 0)
+
+
+def factory_string(index_type: str, dim: int, num_vectors: int, nlist: int = 0, pq_m: int = 0, hnsw_m: int = 32) -> str:
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    nlist = nlist or default_nlist(num_vectors)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{pq_m or default_pq_m(dim)}"
+    raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+
+def build_index(index_type: str, dim: int, train_vectors=None, nlist: int = 0, pq_m: int = 0, hnsw_m: int = 32,
+                max_train: int = 100_000):
+    """Create an empty FAISS index of ``index_type``, trained on a sample of at
+    most ``max_train`` of ``train_vectors`` when the type needs it. Falls back
+    to a flat index when there are too few vectors to train on, so small stores
+    keep working until compaction rebuilds them."""
+    num_vectors = 0 if train_vectors is None else len(train_vectors)
+    if index_type in TRAINED_INDEX_TYPES:
+        needed = min_train_vectors(index_type, nlist or default_nlist(num_vectors))
+        if num_vectors < needed:
+            logging.info(f"Only {num_vectors} vectors to train {index_type} (need {needed}); using a flat index.")
+            return faiss.IndexFlatL2(dim)
+
+    description = factory_string(index_type, dim, num_vectors, nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m)
+    logging.info(f"Building FAISS index {description!r} for dim {dim}.")
+    index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    if not index.is_trained:
+        train_vectors = np.asarray(train_vectors, dtype=np.float32)
+        if len(train_vectors) > max_train:
+            sample = np.random.default_rng(0).choice(len(train_vectors), max_train, replace=False)
+            train_vectors = train_vectors[sample]
+        index.train(train_vectors)
+    return index
+
+
+def ivf_nlist(index) -> int:
+    """Number of lists ``index`` was trained with; 0 if it is not IVF."""
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf.nlist if ivf is not None else 0
+
+
+def needs_retrain(index, num_vectors: int, nlist: int = 0, growth: float = 2.0) -> bool:
+    """Whether an IVF index has outgrown its training: with automatic sizing
+    (``nlist`` 0), once ``default_nlist`` for ``num_vectors`` is ``growth``
+    times the lists it was trained with. Lists trained on a small store are
+    too few and too long, and each search scans a growing share of the index."""
+    trained = ivf_nlist(index)
+    return bool(trained) and not nlist and growth > 0 and default_nlist(num_vectors) >= growth * trained
+
+
+def index_type_of(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def search_parameters(index, nprobe: int = None, ef_search: int = None, selector=None):
+    """Per-call search parameters, so concurrent queries can use different
+    ``nprobe``/``efSearch`` values and ID selectors without mutating the
+    shared index."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF) and (nprobe or selector is not None):
+        return faiss.SearchParametersIVF(nprobe=min(nprobe or index.nprobe, index.nlist), sel=selector)
+    if isinstance(index, faiss.IndexHNSW) and (ef_search or selector is not None):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or index.hnsw.efSearch, sel=selector)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def index_memory_bytes(index) -> int:
+    """Approximate resident size of an index: its codes, ids and graph links."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        # Level 0 holds 2*M neighbours per node; upper levels add little.
+        return index_memory_bytes(index.storage) + index.ntotal * index.hnsw.nb_neighbors(0) * 4
+    if isinstance(index, faiss.IndexIVF):
+        return index.ntotal * (index.code_size + 8) + index.nlist * index.d * 4
+    return index.ntotal * getattr(index, "code_size", index.d * 4)
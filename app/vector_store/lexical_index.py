@@ -0,0 +1,225 @@
+import math
+import re
+from collections import Counter
+from typing import List
+import numpy as np
+
+TOKEN_RE = re.compile(r"[0-9a-z]+(?:[-_./:#][0-9a-z]+)*")
+MAX_TOKEN_LENGTH = 64
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens. Compound identifiers such as part numbers
+    (``AB-1234/5``) are kept whole and also split into their parts, so both
+    the exact identifier and its pieces match."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if len(token) > MAX_TOKEN_LENGTH:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(re.split(r"[-_./:#]", token))
+    return tokens
+
+
+class PostingsSegment:
+    """Immutable postings for a contiguous range of index rows.
+
+    Postings are stored term-major in flat arrays: the entries of term ``i``
+    are ``doc_ids[offsets[i]:offsets[i + 1]]`` (ascending row numbers) with
+    the matching term frequencies in ``tfs``. On disk doc ids are gap-encoded
+    and the arrays zlib-compressed, which keeps postings for long lists of
+    small gaps to a byte or two each.
+    """
+
+    def __init__(self, start: int, terms: np.ndarray, offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_lens: np.ndarray):
+        self.start = start
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        # Terms are kept as Python strings (object arrays): a fixed-width numpy
+        # string array would pad every term to the longest one.
+        self.term_index = {term: i for i, term in enumerate(terms.tolist())}
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    @classmethod
+    def from_postings(cls, start: int, term_of: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                      doc_lens: np.ndarray) -> "PostingsSegment":
+        """Build a segment from parallel (term, row, tf) arrays in any order."""
+        terms, term_ids = np.unique(term_of, return_inverse=True)
+        order = np.lexsort((doc_ids, term_ids))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+        return cls(start, terms, offsets, doc_ids[order].astype(np.uint32), tfs[order].astype(np.uint16),
+                   np.asarray(doc_lens, dtype=np.uint32))
+
+    @classmethod
+    def from_texts(cls, start: int, texts: List[str]) -> "PostingsSegment":
+        term_of, doc_ids, tfs, doc_lens = [], [], [], []
+        for row, text in enumerate(texts, start):
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_of.append(term)
+                doc_ids.append(row)
+                tfs.append(min(tf, 65535))
+        return cls.from_postings(start, np.array(term_of, dtype=object), np.array(doc_ids, dtype=np.int64),
+                                 np.array(tfs, dtype=np.int64), doc_lens)
+
+    @classmethod
+    def merge(cls, segments: List["PostingsSegment"], live: np.ndarray = None) -> "PostingsSegment":
+        """Concatenate consecutive segments into one. With a ``live`` row mask,
+        postings of the other rows are dropped and the rest renumbered."""
+        term_of, doc_ids, tfs = [], [], []
+        for segment in segments:
+            term_of.append(np.repeat(segment.terms, np.diff(segment.offsets)))
+            doc_ids.append(segment.doc_ids.astype(np.int64))
+            tfs.append(segment.tfs)
+        start = segments[0].start if segments else 0
+        term_of = np.concatenate(term_of) if term_of else np.array([], dtype=object)
+        doc_ids = np.concatenate(doc_ids) if doc_ids else np.array([], dtype=np.int64)
+        tfs = np.concatenate(tfs) if tfs else np.array([], dtype=np.uint16)
+        doc_lens = np.concatenate([s.doc_lens for s in segments]) if segments else np.array([], dtype=np.uint32)
+        if live is not None:
+            keep = live[doc_ids - start]
+            term_of, doc_ids, tfs = term_of[keep], doc_ids[keep], tfs[keep]
+            doc_ids = start + (np.cumsum(live) - 1)[doc_ids - start]
+            doc_lens = doc_lens[live]
+        return cls.from_postings(start, term_of, doc_ids, tfs, doc_lens)
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.doc_ids.nbytes + self.tfs.nbytes + self.doc_lens.nbytes
+
+    def postings(self, term: str):
+        i = self.term_index.get(term)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def save(self, f):
+        starts = self.offsets[:-1]
+        gaps = self.doc_ids.copy()
+        if len(gaps):
+            gaps[1:] -= self.doc_ids[:-1]
+            gaps[starts] = self.doc_ids[starts]
+        np.savez_compressed(
+            f,
+            start=np.array([self.start], dtype=np.int64),
+            terms=np.frombuffer("\n".join(self.terms.tolist()).encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            gaps=gaps,
+            tfs=self.tfs,
+            doc_lens=self.doc_lens,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PostingsSegment":
+        with np.load(path) as data:
+            offsets = data["offsets"]
+            gaps = data["gaps"].astype(np.int64)
+            terms = data["terms"].tobytes().decode("utf-8")
+            starts = offsets[:-1]
+            cumulative = np.cumsum(gaps)
+            doc_ids = cumulative - np.repeat(cumulative[starts] - gaps[starts], np.diff(offsets))
+            return cls(
+                int(data["start"][0]),
+                np.array(terms.split("\n") if terms else [], dtype=object),
+                offsets,
+                doc_ids.astype(np.uint32),
+                data["tfs"],
+                data["doc_lens"],
+            )
+
+
+class LexicalIndex:
+    """BM25 over a list of ``PostingsSegment``s that together cover index rows
+    ``0..num_docs``, in the same order as the FAISS index."""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, segments: List[PostingsSegment] = None):
+        self.segments = []
+        self.num_docs = 0
+        self.total_len = 0
+        for segment in segments or []:
+            self.add_segment(segment)
+
+    def build_segment(self, texts: List[str]) -> PostingsSegment:
+        return PostingsSegment.from_texts(self.num_docs, texts)
+
+    def add_segment(self, segment: PostingsSegment):
+        if segment.start != self.num_docs:
+            raise ValueError(f"Postings segment starts at row {segment.start}, expected {self.num_docs}.")
+        self.segments.append(segment)
+        self.num_docs += len(segment)
+        self.total_len += int(segment.doc_lens.sum())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(segment.nbytes for segment in self.segments)
+
+    def compact(self) -> PostingsSegment:
+        """Merge every segment into one and return it."""
+        merged = PostingsSegment.merge(self.segments)
+        self.segments = [merged]
+        return merged
+
+    def search(self, query: str, k: int = 4, mask: np.ndarray = None):
+        """Return up to ``k`` ``(row, score)`` pairs, best first, optionally
+        only among the rows where ``mask`` is set."""
+        if not self.num_docs:
+            return []
+        avg_len = self.total_len / self.num_docs
+        rows, scores = [], []
+        for term in set(tokenize(query)):
+            matches = []
+            for segment in self.segments:
+                postings = segment.postings(term)
+                if postings is not None:
+                    matches.append((segment, *postings))
+            if not matches:
+                continue
+            df = sum(len(ids) for _, ids, _ in matches)
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            for segment, ids, tfs in matches:
+                tf = tfs.astype(np.float32)
+                lengths = segment.doc_lens[ids - segment.start].astype(np.float32)
+                norm = tf + self.K1 * (1 - self.B + self.B * lengths / avg_len)
+                rows.append(ids)
+                scores.append(idf * tf * (self.K1 + 1) / norm)
+        if not rows:
+            return []
+
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        if len(rows) * 8 > self.num_docs:
+            # Common terms: summing into one slot per row beats sorting the candidates.
+            totals = np.bincount(rows, weights=scores, minlength=self.num_docs)
+            unique_rows = np.flatnonzero(totals)
+            totals = totals[unique_rows]
+        else:
+            unique_rows, inverse = np.unique(rows, return_inverse=True)
+            totals = np.bincount(inverse, weights=scores)
+        if mask is not None:
+            keep = mask[unique_rows]
+            unique_rows, totals = unique_rows[keep], totals[keep]
+        top = np.argpartition(-totals, k)[:k] if len(totals) > k else np.arange(len(totals))
+        top = top[np.argsort(-totals[top], kind="stable")]
+        return [(int(unique_rows[i]), float(totals[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60) -> List:
+    """Fuse ranked lists of ids: each id scores ``sum(1 / (k + rank))`` over the
+    lists it appears in (rank starting at 1). Returns ids, best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, 1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,166 @@
+import json
+import threading
+from datetime import datetime
+from typing import List
+import numpy as np
+
+STRING_FIELDS = ("document_id", "filename", "source")
+NUMBER_FIELDS = ("page", "uploaded_at")
+FIELDS = STRING_FIELDS + NUMBER_FIELDS
+
+COMPARISONS = {
+    "$eq": np.equal,
+    "$neq": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+OPERATORS = frozenset([*COMPARISONS, "$in", "$nin"])
+
+
+class MetadataColumns:
+    """Filterable chunk metadata, one numpy column per field, row-aligned with
+    the FAISS index.
+
+    String fields are dictionary-encoded to int32 codes (-1 when missing) and
+    numeric fields are float64 (NaN when missing), so a filter is evaluated
+    with a few vectorized comparisons instead of a Python pass over every
+    document. Filters use the same operators as LangChain's FAISS filters:
+    ``{"filename": "report.pdf", "page": {"$gte": 3, "$lte": 10}}``, plus
+    ``$and``, ``$or`` and ``$not``; a list value means ``$in``.
+
+    Appended rows are concatenated into the columns on first read, under a
+    lock of their own: concurrent searches only share the index's read lock.
+    """
+
+    def __init__(self, metadatas: List[dict] = None):
+        self._lock = threading.Lock()
+        self.num_rows = 0
+        self._codes = {field: {} for field in STRING_FIELDS}
+        self._pending = {field: [] for field in FIELDS}
+        self._columns = {field: np.empty(0, dtype=np.int32 if field in STRING_FIELDS else np.float64)
+                         for field in FIELDS}
+        if metadatas:
+            self.append(metadatas)
+
+    def _encode(self, field: str, value) -> int:
+        if value is None:
+            return -1
+        return self._codes[field].setdefault(str(value), len(self._codes[field]))
+
+    @staticmethod
+    def _number(field: str, value) -> float:
+        if value is None:
+            return np.nan
+        if field == "uploaded_at" and isinstance(value, str):
+            return datetime.fromisoformat(value).timestamp()
+        return float(value)
+
+    def append(self, metadatas: List[dict]):
+        for field in STRING_FIELDS:
+            self._pending[field].append(np.array([self._encode(field, m.get(field)) for m in metadatas], dtype=np.int32))
+        for field in NUMBER_FIELDS:
+            self._pending[field].append(np.array([self._number(field, m.get(field)) for m in metadatas], dtype=np.float64))
+        self.num_rows += len(metadatas)
+
+    def extend(self, other: "MetadataColumns"):
+        """Append the rows of ``other``, re-encoding its string codes."""
+        for field in STRING_FIELDS:
+            remap = np.array([self._encode(field, value) for value in other._codes[field]] + [-1], dtype=np.int32)
+            # Code -1 (missing) indexes the trailing -1.
+            self._pending[field].append(remap[other.column(field)])
+        for field in NUMBER_FIELDS:
+            self._pending[field].append(other.column(field))
+        self.num_rows += other.num_rows
+
+    def update(self, rows, metadata: dict):
+        """Overwrite the fields in ``metadata`` for ``rows``."""
+        for field, value in metadata.items():
+            if field in STRING_FIELDS:
+                self.column(field)[rows] = self._encode(field, value)
+            elif field in NUMBER_FIELDS:
+                self.column(field)[rows] = self._number(field, value)
+
+    def has_value(self, field: str, rows, value) -> np.ndarray:
+        """Whether each of ``rows`` has ``value`` for the text ``field``."""
+        return self.column(field)[rows] == self._codes[field].get(str(value), -2)
+
+    def to_arrays(self) -> dict:
+        arrays = {f"meta_{field}": self.column(field) for field in FIELDS}
+        for field in STRING_FIELDS:
+            vocabulary = json.dumps(list(self._codes[field])).encode("utf-8")
+            arrays[f"meta_{field}_values"] = np.frombuffer(vocabulary, dtype=np.uint8)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "MetadataColumns":
+        """Inverse of ``to_arrays``; ``arrays`` may be an open ``.npz``."""
+        columns = cls()
+        for field in STRING_FIELDS:
+            values = json.loads(arrays[f"meta_{field}_values"].tobytes().decode("utf-8"))
+            columns._codes[field] = {value: code for code, value in enumerate(values)}
+        for field in FIELDS:
+            columns._columns[field] = arrays[f"meta_{field}"]
+        columns.num_rows = len(columns._columns[FIELDS[0]])
+        return columns
+
+    def column(self, field: str) -> np.ndarray:
+        with self._lock:
+            if self._pending[field]:
+                self._columns[field] = np.concatenate([self._columns[field], *self._pending[field]])
+                self._pending[field] = []
+            return self._columns[field]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.column(field).nbytes for field in FIELDS)
+
+    def mask(self, filter: dict) -> np.ndarray:
+        """Boolean mask of the rows matching ``filter``."""
+        if not isinstance(filter, dict):
+            raise ValueError(f"filter must be a dict, not {type(filter).__name__}")
+        mask = np.ones(self.num_rows, dtype=bool)
+        for key, condition in filter.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self.mask(sub)
+            elif key == "$or":
+                any_match = np.zeros(self.num_rows, dtype=bool)
+                for sub in condition:
+                    any_match |= self.mask(sub)
+                mask &= any_match
+            elif key == "$not":
+                mask &= ~self.mask(condition)
+            elif key in FIELDS:
+                mask &= self._field_mask(key, condition)
+            else:
+                raise ValueError(f"Cannot filter on {key!r}; filterable fields are {', '.join(FIELDS)}")
+        return mask
+
+    def _field_mask(self, field: str, condition) -> np.ndarray:
+        if isinstance(condition, list):
+            condition = {"$in": condition}
+        elif not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        column = self.column(field)
+        mask = np.ones(self.num_rows, dtype=bool)
+        for op, value in condition.items():
+            if op not in OPERATORS:
+                raise ValueError(f"filter contains unsupported operator: {op}")
+            if field in STRING_FIELDS:
+                codes = self._codes[field]
+                if op in ("$in", "$nin"):
+                    match = np.isin(column, [codes.get(str(v), -2) for v in value])
+                    mask &= match if op == "$in" else ~match
+                elif op in ("$eq", "$neq"):
+                    mask &= COMPARISONS[op](column, codes.get(str(value), -2))
+                else:
+                    raise ValueError(f"{op} is not supported for the text field {field!r}")
+            elif op in ("$in", "$nin"):
+                match = np.isin(column, [self._number(field, v) for v in value])
+                mask &= match if op == "$in" else ~match
+            else:
+                mask &= COMPARISONS[op](column, self._number(field, value))
+        return mask
@@ -0,0 +1,112 @@
+"""Convert vector stores to the memory-mapped docstore layout.
+
+Run offline, with the API stopped:
+
+    python -m app.vector_store.migrate_docstore --path faiss_store
+
+Every store under ``--path`` (the default collection and each one in
+``collections/``) is converted:
+
+* segment stores get a ``.docs.idx.npz`` for every segment that lacks one
+  (the API also builds these on first load, this just does it up front);
+* pickled LangChain stores (``index.faiss`` + ``index.pkl``) are loaded once,
+  written as a base segment and the old files renamed to ``*.migrated``. Their
+  chunks are re-keyed by text hash, like every segment row, and added to the
+  hash registry so uploads recognise them; duplicate texts keep one row. The
+  API no longer unpickles them itself, and refuses uploads to a store until its
+  pickle is converted. Stores that already have segments next to a pickle
+  (written before that check) get the pickled chunks appended as a delta
+  segment instead, minus those whose text the segments already hold.
+
+Only migrate pickles you created: loading one can run arbitrary code.
+"""
+import argparse
+import os
+import time
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from app.vector_store.hash_registry import HashRegistry, chunk_hash
+from app.vector_store.lexical_index import PostingsSegment
+from app.vector_store.segment_store import SegmentStore
+
+PICKLED_FILES = ("index.faiss", "index.pkl")
+
+
+def store_paths(root: str):
+    yield root
+    collections = os.path.join(root, "collections")
+    if os.path.isdir(collections):
+        for name in sorted(os.listdir(collections)):
+            if os.path.isdir(os.path.join(collections, name)):
+                yield os.path.join(collections, name)
+
+
+def _vectors(index, rows) -> np.ndarray:
+    """The stored vectors of ``rows``; IVF indexes need a direct map for it."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return np.stack([index.reconstruct(int(row)) for row in rows])
+
+
+def migrate_pickled(path: str, segments: SegmentStore) -> int:
+    store = FAISS.load_local(folder_path=path, embeddings=None, allow_dangerous_deserialization=True)
+    existing = segments.ids() if segments.exists() else []
+    tombstones = segments.tombstones
+    live = {id_ for row, id_ in enumerate(existing) if row not in tombstones}
+    # Pickled ids may be LangChain uuids; segment ids are chunk hashes.
+    rows, ids, documents = [], [], []
+    for row in range(store.index.ntotal):
+        document = store.docstore.search(store.index_to_docstore_id[row])
+        hash_ = chunk_hash(document.page_content)
+        if hash_ in live:
+            continue
+        live.add(hash_)
+        rows.append(row)
+        ids.append(hash_)
+        documents.append(document)
+    if ids:
+        postings = PostingsSegment.from_texts(len(existing), [doc.page_content for doc in documents])
+        if existing:
+            segments.append(_vectors(store.index, rows), ids, documents, postings)
+        else:
+            index = store.index
+            if len(rows) < index.ntotal:
+                index = faiss.IndexFlat(index.d, index.metric_type)
+                index.add(_vectors(store.index, rows))
+            segments.write_base(index, ids, documents, postings)
+        registry = HashRegistry(path)
+        registry.register_chunks([hash_ for hash_ in ids if not registry.has_chunk(hash_)])
+        registry.save()
+    for filename in PICKLED_FILES:
+        os.replace(os.path.join(path, filename), os.path.join(path, filename + ".migrated"))
+    return len(ids)
+
+
+def migrate(path: str) -> str:
+    segments = SegmentStore(path)
+    pickled = os.path.exists(os.path.join(path, "index.pkl"))
+    if segments.exists():
+        built = segments.index_all()
+        if pickled:
+            return f"indexed {built} segments, appended {migrate_pickled(path, segments)} pickled chunks"
+        return f"indexed {built} segments" if built else "already migrated"
+    if pickled:
+        return f"converted pickled store with {migrate_pickled(path, segments)} chunks"
+    return "empty"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert vector stores to the memory-mapped docstore.")
+    parser.add_argument("--path", default="faiss_store", help="Vector store root directory")
+    args = parser.parse_args()
+
+    for path in store_paths(args.path):
+        start = time.perf_counter()
+        outcome = migrate(path)
+        print(f"{path}: {outcome} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Migrate an existing vector store to another FAISS index type.
+
+Run offline, with the API stopped, e.g.:
+
+    python -m app.vector_store.rebuild --index-type hnsw --report
+    python -m app.vector_store.rebuild --index-type ivf_pq --nlist 1024 --report --report-json report.json
+
+Named collections are rebuilt one at a time by passing their directory, e.g.
+``--path faiss_store/collections/acme``.
+
+Set ``FAISS_INDEX_TYPE`` to the same type before restarting the API, otherwise
+the next compaction converts the index back to the configured type.
+
+With ``--report`` the new index is compared against an exact flat baseline:
+recall@k and per-query latency for a sweep of ``nprobe`` (IVF) or
+``efSearch`` (HNSW) values. Queries are the lines of ``--query-file``,
+embedded as queries, or else indexed vectors with themselves left out of
+both result lists; an indexed vector is always its own nearest neighbour,
+which would inflate recall.
+"""
+import argparse
+import json
+import time
+import faiss
+import numpy as np
+from app.vector_store.vector_store import VectorStore
+from app.vector_store.index_factory import INDEX_TYPES, index_type_of, search_parameters
+
+NPROBE_SWEEP = (1, 4, 8, 16, 32, 64, 128)
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256, 512)
+
+
+def _timed_search(index, queries, k, params=None):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, rows = index.search(query[None, :], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(rows[0])
+    return np.array(results), np.array(latencies)
+
+
+def _recall(approx, exact, k, exclude=None):
+    """Share of the exact top ``k`` found in the approximate top ``k``; row
+    ``exclude[i]`` is left out of both lists of query ``i``."""
+    hits = 0
+    for i, (a, e) in enumerate(zip(approx, exact)):
+        if exclude is not None:
+            a, e = a[a != exclude[i]], e[e != exclude[i]]
+        hits += len(set(a[:k]) & set(e[:k]))
+    return hits / (len(exact) * k)
+
+
+def recall_report(index, vectors, k=10, num_queries=200, seed=0, queries=None):
+    """Compare ``index`` against an exact flat index built from ``vectors``.
+
+    ``queries`` should not be in the index. Without them, ``num_queries``
+    indexed vectors are sampled and each one's own row is excluded."""
+    exclude = None
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        exclude = rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)
+        queries = vectors[exclude]
+    queries = np.asarray(queries, dtype=np.float32)
+    # One extra result, so k remain once the query's own row is dropped.
+    fetch_k = k + 1 if exclude is not None else k
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    exact, flat_latency = _timed_search(flat, queries, fetch_k)
+    rows = [{"index": "flat", "param": None, "recall": 1.0,
+             "p50_ms": float(np.percentile(flat_latency, 50)), "p95_ms": float(np.percentile(flat_latency, 95))}]
+
+    kind = index_type_of(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        sweep = [("nprobe", n, search_parameters(index, nprobe=n)) for n in NPROBE_SWEEP]
+    elif kind == "hnsw":
+        sweep = [("efSearch", ef, search_parameters(index, ef_search=ef)) for ef in EF_SEARCH_SWEEP]
+    else:
+        sweep = [(None, None, None)]
+
+    for name, value, params in sweep:
+        approx, latency = _timed_search(index, queries, fetch_k, params=params)
+        rows.append({
+            "index": kind,
+            "param": f"{name}={value}" if name else None,
+            "recall": _recall(approx, exact, k, exclude),
+            "p50_ms": float(np.percentile(latency, 50)),
+            "p95_ms": float(np.percentile(latency, 95)),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a vector store with a different FAISS index type.")
+    parser.add_argument("--path", default="faiss_store", help="Vector store directory")
+    parser.add_argument("--index-type", required=True, choices=INDEX_TYPES)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = 4*sqrt(N))")
+    parser.add_argument("--pq-m", type=int, default=0, help="PQ sub-quantizers (0 = dim/8)")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW neighbours per node")
+    parser.add_argument("--report", action="store_true", help="Print recall@k vs latency against flat")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-file", help="Held-out queries, one per line (default: sampled chunks)")
+    parser.add_argument("--report-json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    store = VectorStore(path=args.path)
+    if store.vector_store is None:
+        parser.error(f"No index found at {args.path}")
+
+    start = time.perf_counter()
+    store.rebuild(args.index_type, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+    index = store.vector_store.index
+    print(f"Rebuilt {index.ntotal} vectors as {index_type_of(index)} in {time.perf_counter() - start:.1f}s")
+
+    if args.report:
+        texts = [store.vector_store.docstore.search(store.vector_store.index_to_docstore_id[i]).page_content
+                 for i in range(index.ntotal)]
+        vectors = np.asarray(store.embeddings.embed_documents(texts), dtype=np.float32)
+        queries = None
+        if args.query_file:
+            with open(args.query_file, encoding="utf-8") as f:
+                queries = [store.embeddings.embed_query(line.strip()) for line in f if line.strip()]
+        rows = recall_report(index, vectors, k=args.k, num_queries=args.queries, queries=queries)
+        print(f"{'index':<10}{'param':<16}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for row in rows:
+            print(f"{row['index']:<10}{row['param'] or '-':<16}{row['recall']:>10.3f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}")
+        if args.report_json:
+            with open(args.report_json, "w", encoding="utf-8") as f:
+                json.dump({"k": args.k, "ntotal": int(index.ntotal), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import math
+import threading
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from app.logger import logging
+
+
+class CrossEncoderReranker:
+    """Second-stage ranking of retrieved chunks with a local cross-encoder.
+
+    The first stage over-fetches candidates; the cross-encoder then reads each
+    (query, chunk) pair together, which ranks far better than comparing two
+    independent embeddings. All candidates are scored in one batched forward
+    pass on the CPU.
+
+    At most ``max_candidates`` are scored. With a ``latency_budget_ms``, the
+    measured cost per pair of earlier calls decides how many candidates fit in
+    the budget; if not even ``k`` fit, the first-stage order is kept. Chunks
+    scoring below ``min_score`` (in the model's own score units) are dropped,
+    so fewer than ``k`` may come back.
+    """
+
+    def __init__(self, model_name: str, max_candidates: int = 50, min_score: float = -math.inf,
+                 latency_budget_ms: float = 0, max_length: int = 512):
+        self.model_name = model_name
+        self.max_candidates = max_candidates
+        self.min_score = min_score
+        self.latency_budget_ms = latency_budget_ms
+        self.max_length = max_length
+        self.seconds_per_pair = None
+        self._model = None
+        self._load_lock = threading.Lock()
+        # One batch at a time: concurrent forward passes would only fight over the cores.
+        self._predict_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    logging.info(f"Loading cross-encoder {self.model_name}")
+                    self._model = CrossEncoder(self.model_name, device="cpu", max_length=self.max_length)
+        return self._model
+
+    def _affordable(self, num_candidates: int) -> int:
+        """How many candidates can be scored within the latency budget."""
+        if not self.latency_budget_ms or self.seconds_per_pair is None:
+            return num_candidates
+        return min(num_candidates, int(self.latency_budget_ms / 1000 / self.seconds_per_pair))
+
+    def score(self, query: str, documents: List[Document]) -> np.ndarray:
+        model = self.model
+        pairs = [(query, doc.page_content) for doc in documents]
+        start = time.perf_counter()
+        with self._predict_lock:
+            scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False, convert_to_numpy=True)
+        per_pair = (time.perf_counter() - start) / len(pairs)
+        # Smoothed, so one slow call (e.g. a cold cache) does not shrink every later batch.
+        self.seconds_per_pair = per_pair if self.seconds_per_pair is None else \
+            0.8 * self.seconds_per_pair + 0.2 * per_pair
+        return np.asarray(scores, dtype=np.float32).reshape(len(pairs))
+
+    def rerank(self, query: str, documents: List[Document], k: int = 4) -> List[Tuple[Document, Optional[float]]]:
+        """Return up to ``k`` ``(document, score)`` pairs, best first. The score
+        is None when reranking was skipped for the latency budget."""
+        candidates = documents[:self.max_candidates]
+        if not candidates:
+            return []
+        affordable = self._affordable(len(candidates))
+        if affordable < min(k, len(candidates)):
+            logging.warning(f"Skipping rerank: {len(candidates)} candidates would exceed the "
+                            f"{self.latency_budget_ms} ms budget ({self.seconds_per_pair * 1000:.2f} ms per pair).")
+            return [(doc, None) for doc in documents[:k]]
+        candidates = candidates[:affordable]
+
+        start = time.perf_counter()
+        scores = self.score(query, candidates)
+        order = np.argsort(-scores, kind="stable")[:k]
+        ranked = [(candidates[i], float(scores[i])) for i in order if scores[i] >= self.min_score]
+        logging.info(f"Reranked {len(candidates)} candidates in {(time.perf_counter() - start) * 1000:.1f} ms, "
+                     f"kept {len(ranked)}.")
+        return ranked
@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+from typing import Dict, List, Set
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from app.vector_store.lexical_index import LexicalIndex, PostingsSegment
+from app.vector_store.metadata_store import MetadataColumns
+from app.vector_store.docstore import (
+    DocsSegment, SegmentDocstore, docs_paths, index_docs_file, write_docs, write_docs_index,
+)
+from app.logger import logging
+
+
+def _fsync_write(path: str, write):
+    """Write a file through ``write(f)`` to a temp path, fsync it and rename it
+    into place so readers only ever see complete files."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SegmentStore:
+    """Append-only on-disk layout for the FAISS index and its docstore.
+
+    The store is a base segment (a serialized FAISS index plus its documents)
+    followed by delta segments holding only the vectors and documents added
+    since. Every segment also carries the BM25 postings of its documents
+    (``.lex.npz``) and an index of its documents file (``.docs.idx.npz``), so
+    loading reads neither the chunk texts nor their metadata records.
+    ``manifest.json`` lists the live segments and is replaced atomically,
+    which is the commit point: segment files not referenced by the manifest
+    are ignored and removed on the next compaction.
+
+    Deletes are appended to a log named after the base segment
+    (``<base>.deletes.jsonl``), one fsynced record per delete, so the next
+    base segment starts a new log and the old one is removed with its base.
+    """
+
+    def __init__(self, path: str):
+        self.dir = os.path.join(path, "segments")
+        os.makedirs(self.dir, exist_ok=True)
+        self.manifest_path = os.path.join(self.dir, "manifest.json")
+        self._lock = threading.Lock()
+        self.manifest = {"base": None, "deltas": [], "next_id": 1}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        # Manifests written before the deletes log kept tombstones themselves.
+        self._tombstones = set(self.manifest.get("tombstones", []))
+        self._metadata = json.loads(json.dumps(self.manifest.get("metadata", {})))
+        self._replay_deletes()
+
+    def exists(self) -> bool:
+        return self.manifest["base"] is not None or bool(self.manifest["deltas"])
+
+    @property
+    def num_deltas(self) -> int:
+        return len(self.manifest["deltas"])
+
+    @property
+    def tombstones(self) -> Set[int]:
+        """Rows of deleted documents, until the next base segment drops them."""
+        return self._tombstones
+
+    @property
+    def metadata_updates(self) -> Dict[str, dict]:
+        """Metadata changed since documents were written (id -> fields), until
+        the next base segment rewrites them."""
+        return self._metadata
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _deletes_path(self) -> str:
+        return self._file(f"{self.manifest['base'] or 'initial'}.deletes.jsonl")
+
+    def _apply_delete(self, record: dict):
+        self._tombstones.update(record["rows"])
+        for id_ in record["released"]:
+            self._metadata.pop(id_, None)
+        for id_, fields in record["metadata"].items():
+            self._metadata.setdefault(id_, {}).update(fields)
+
+    def _replay_deletes(self):
+        path = self._deletes_path()
+        if not os.path.exists(path):
+            return
+        with open(path, "r+b") as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn by a crash mid-write, so never committed.
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                self._apply_delete(record)
+
+    def _commit(self, manifest: dict):
+        _fsync_write(self.manifest_path, lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+        self.manifest = manifest
+
+    def _postings(self, name: str, start: int, docs: DocsSegment) -> PostingsSegment:
+        path = self._file(f"{name}.lex.npz")
+        if os.path.exists(path):
+            return PostingsSegment.load(path)
+        # Segments written before the lexical index existed.
+        logging.info(f"Building missing postings for segment {name}.")
+        return PostingsSegment.from_texts(start, docs.texts())
+
+    def open_docs(self, name: str) -> DocsSegment:
+        """The documents of segment ``name``. Segments written before documents
+        were indexed get their ``.docs.idx.npz`` built here, once."""
+        docs_path, index_path = docs_paths(self.dir, name)
+        if not os.path.exists(index_path):
+            logging.info(f"Indexing documents of segment {name}.")
+            ids, offsets, columns = index_docs_file(docs_path)
+            _fsync_write(index_path, lambda f: write_docs_index(f, ids, offsets, columns))
+        return DocsSegment(docs_path, index_path)
+
+    def index_all(self) -> int:
+        """Make sure every live segment has its documents index; returns how
+        many had to be built."""
+        missing = [name for name in self._live() if not os.path.exists(docs_paths(self.dir, name)[1])]
+        for name in missing:
+            self.open_docs(name)
+        return len(missing)
+
+    def ids(self) -> List[str]:
+        """Docstore ids of every row, tombstoned ones included, in row order."""
+        return [id_ for name in self._live() for id_ in self.open_docs(name).ids]
+
+    def _write_docs(self, name: str, ids: List[str], documents: List[Document]):
+        docs_path, index_path = docs_paths(self.dir, name)
+        offsets = []
+        _fsync_write(docs_path, lambda f: offsets.append(write_docs(f, ids, documents)))
+        columns = MetadataColumns([doc.metadata for doc in documents])
+        _fsync_write(index_path, lambda f: write_docs_index(f, ids, offsets[0], columns))
+
+    def _live(self) -> List[str]:
+        return [name for name in (self.manifest["base"], *self.manifest["deltas"]) if name is not None]
+
+    def load(self, dim: int = None, tombstones=()):
+        """Return ``(index, ids, docstore, lexical, columns)`` with all segments
+        merged, rows in insertion order. Documents stay on disk behind the
+        docstore; rows in ``tombstones`` are left out of it. ``dim`` is only
+        needed when there is no base segment."""
+        index, ids = None, []
+        docstore, lexical, columns = SegmentDocstore(), LexicalIndex(), MetadataColumns()
+        tombstones = set(tombstones)
+        base = self.manifest["base"]
+        if base is not None:
+            index = faiss.read_index(self._file(f"{base}.faiss"))
+
+        for name in self._live():
+            if name != base:
+                vectors = np.load(self._file(f"{name}.npy"))
+                if index is None:
+                    index = faiss.IndexFlatL2(dim or vectors.shape[1])
+                index.add(vectors)
+            docs = self.open_docs(name)
+            lexical.add_segment(self._postings(name, len(ids), docs))
+            docstore.attach(docs, len(ids), tombstones)
+            columns.extend(docs.columns)
+            ids.extend(docs.ids)
+
+        updates = self.metadata_updates
+        if updates:
+            row_of = {id_: row for row, id_ in enumerate(ids) if id_ in updates}
+            for id_, row in row_of.items():
+                columns.update([row], updates[id_])
+            docstore.update_metadata(updates)
+        logging.info(f"Loaded {len(ids)} vectors from {1 if base else 0} base and {self.num_deltas} delta segments.")
+        return index, ids, docstore, lexical, columns
+
+    def append(self, vectors, ids: List[str], documents: List[Document], postings: PostingsSegment) -> str:
+        """Write a delta segment for newly added vectors, commit it and return
+        its name."""
+        with self._lock:
+            manifest = json.loads(json.dumps(self.manifest))
+            name = f"delta_{manifest['next_id']:06d}"
+            manifest["next_id"] += 1
+            vectors = np.asarray(vectors, dtype=np.float32)
+            _fsync_write(self._file(f"{name}.npy"), lambda f: np.save(f, vectors))
+            self._write_docs(name, ids, documents)
+            _fsync_write(self._file(f"{name}.lex.npz"), postings.save)
+            manifest["deltas"].append(name)
+            self._commit(manifest)
+            logging.info(f"Committed segment {name} with {len(ids)} vectors.")
+            return name
+
+    def add_tombstones(self, rows: List[int], released: List[str] = (), metadata: Dict[str, dict] = None):
+        """Mark rows as deleted, record ``metadata`` updates of the rows kept
+        and commit. Updates of the ``released`` ids are forgotten, so they do
+        not apply to the same chunk if it is added again."""
+        record = {"rows": list(rows), "released": list(released), "metadata": metadata or {}}
+        with self._lock:
+            with open(self._deletes_path(), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply_delete(record)
+
+    def write_base(self, index, ids: List[str], documents: List[Document], postings: PostingsSegment) -> str:
+        """Replace every live segment with a single base segment (compaction)
+        and return its name."""
+        with self._lock:
+            manifest = json.loads(json.dumps(self.manifest))
+            name = f"base_{manifest['next_id']:06d}"
+            manifest["next_id"] += 1
+            _fsync_write(self._file(f"{name}.faiss"), lambda f: f.write(faiss.serialize_index(index).tobytes()))
+            self._write_docs(name, ids, documents)
+            _fsync_write(self._file(f"{name}.lex.npz"), postings.save)
+            manifest["base"] = name
+            manifest["deltas"] = []
+            manifest.pop("tombstones", None)
+            manifest.pop("metadata", None)
+            self._commit(manifest)
+            self._tombstones = set()
+            self._metadata = {}
+            logging.info(f"Committed base segment {name} with {len(ids)} vectors.")
+            self._remove_unreferenced()
+            return name
+
+    def _remove_unreferenced(self):
+        live = self._live()
+        for filename in os.listdir(self.dir):
+            if filename == "manifest.json" or filename.split(".", 1)[0] in live:
+                continue
+            try:
+                os.remove(self._file(filename))
+            except OSError:
+                pass
@@ -1,49 +1,672 @@
+import functools
+import itertools
+import math
 import os
+import threading
+import time
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.vector_store.hash_registry import HashRegistry, chunk_hash
+from app.vector_store.embedding_cache import EmbeddingCache, CachedEmbeddings, embed_queries
+from app.vector_store.embedding_engine import EmbeddingEngine
+from app.vector_store.embedding_backends import check_compatibility, model_kwargs
+from app.vector_store.segment_store import SegmentStore
+from app.vector_store.docstore import SegmentDocstore
+from app.vector_store.lexical_index import LexicalIndex, PostingsSegment, reciprocal_rank_fusion
+from app.vector_store.metadata_store import MetadataColumns
+from app.vector_store.rwlock import ReadWriteLock
+from app.vector_store.index_factory import (
+    build_index,
+    default_nlist,
+    index_memory_bytes,
+    index_type_of,
+    min_train_vectors,
+    needs_retrain,
+    search_parameters,
+    TRAINED_INDEX_TYPES,
+)
+from app.config import Config
 from app.logger import logging
+from app.metrics.registry import span
+
+
+class UnmigratedStoreError(RuntimeError):
+    """Raised on writes to a store that still holds a pickled FAISS store."""
+
+
+class LazyEmbeddings(Embeddings):
+    """Embeddings built by ``factory`` on first use, so importing the app
+    neither imports torch nor loads the model. Safe to call from any thread."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._embeddings = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._embeddings is not None
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    start = time.perf_counter()
+                    self._embeddings = self._factory()
+                    logging.info(f"Loaded embedding model in {time.perf_counter() - start:.2f}s")
+        return self._embeddings
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts):
+        embeddings = self.embeddings
+        # HuggingFaceEmbeddings.embed_query is embed_documents on one text
+        # unless query-specific encode kwargs are set.
+        if hasattr(embeddings, "query_encode_kwargs") and not embeddings.query_encode_kwargs:
+            return embeddings.embed_documents(texts)
+        return [embeddings.embed_query(text) for text in texts]
+
+
+def _huggingface_embeddings(cache_dir):
+    # Imported here: sentence-transformers pulls in torch, which takes seconds.
+    from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name=Config.EMBEDDING_MODEL,
+        model_kwargs=model_kwargs(Config.EMBEDDING_BACKEND, Config.EMBEDDING_MODEL_FILE),
+        encode_kwargs={"batch_size": Config.EMBED_BATCH_SIZE},
+    )
+    # Cached and indexed vectors may come from another backend; refuse to mix
+    # them with ones that are too different.
+    check_compatibility(embeddings.embed_documents, cache_dir, Config.EMBEDDING_BACKEND, Config.EMBEDDING_TOLERANCE)
+    return embeddings
+
+
+def build_embeddings(path):
+    """The embedding model (on ``Config.EMBEDDING_BACKEND``), with its embedding
+    cache stored under ``path``. The model itself is loaded on first use."""
+    cache = EmbeddingCache(path, Config.EMBEDDING_MODEL)
+    return CachedEmbeddings(
+        EmbeddingEngine(
+            LazyEmbeddings(functools.partial(_huggingface_embeddings, cache.dir)),
+            Config.EMBEDDING_MODEL,
+            workers=Config.EMBED_WORKERS,
+            batch_size=Config.EMBED_BATCH_SIZE,
+            model_kwargs=model_kwargs(Config.EMBEDDING_BACKEND, Config.EMBEDDING_MODEL_FILE),
+        ),
+        cache,
+        query_cache_size=Config.QUERY_EMBEDDING_CACHE_SIZE,
+    )
+
 
 class VectorStore:
-    def __init__(self, path="faiss_store"):
+    def __init__(self, path="faiss_store", embeddings=None):
         logging.info(f"Initializing VectorStore at path: {path}")
         self.path = path
         os.makedirs(path, exist_ok=True)
 
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        # Writers (ingestion jobs) are serialized end to end; the index lock is
+        # only held while the in-memory index is mutated or searched, and lets
+        # any number of searches run at once.
+        self._write_lock = threading.Lock()
+        self._index_lock = ReadWriteLock()
+        self._load_lock = threading.Lock()
+        self.registry = HashRegistry(path)
+
+        # Collections share one embedding model, passed in as ``embeddings``.
+        self.embeddings = embeddings or build_embeddings(path)
+
+        self.segments = SegmentStore(path)
+        self._set_rows([], MetadataColumns(), LexicalIndex())
+        self._vector_store = None
+        self._loaded = False
+        self._compacting = False
+        # Bumped whenever searches may start returning different results, so
+        # caches of answers derived from the index know when they are stale.
+        self.version = 0
+
+    @property
+    def vector_store(self):
+        """The FAISS store, loaded from the segments on first access."""
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._vector_store = self._load()
+                    self._loaded = True
+        return self._vector_store
+
+    @property
+    def loaded(self) -> bool:
+        return self._vector_store is not None
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the loaded index, document offsets,
+        postings and metadata columns. Chunk texts are read from disk on
+        demand and only count while in the page cache."""
+        store = self._vector_store
+        if store is None:
+            return 0
+        return index_memory_bytes(store.index) + store.docstore.nbytes + self.lexical.nbytes + self.columns.nbytes
+
+    def unload(self, blocking=True) -> bool:
+        """Drop the in-memory index; it is loaded again from the segments on
+        next use. With ``blocking=False``, gives up (returning False) instead of
+        waiting for a running ingestion or compaction."""
+        if not self._write_lock.acquire(blocking=blocking):
+            return False
+        try:
+            with self._load_lock, self._index_lock.write():
+                self._vector_store = None
+                self._set_rows([], MetadataColumns(), LexicalIndex())
+                self._loaded = False
+            return True
+        finally:
+            self._write_lock.release()
+
+    def _wrap(self, index, ids, docstore):
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=dict(enumerate(ids)),
         )
 
-        index_path = os.path.join(path, "faiss.index")
+    def _set_rows(self, ids, columns, lexical, tombstones=()):
+        """Reset the per-row state that goes with a loaded or rebuilt index."""
+        self.lexical = lexical
+        self.columns = columns
+        self._tombstones = set(tombstones)
+        self._live = None
+        self._row_of = {id_: row for row, id_ in enumerate(ids) if row not in self._tombstones}
+
+    def _snapshot(self):
+        """Ids and documents of the live rows, in row order."""
+        store = self._vector_store
+        ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal) if i not in self._tombstones]
+        return ids, [store.docstore.search(id_) for id_ in ids]
+
+    def _load(self):
+        if self.segments.exists():
+            # Deleted rows stay in the index until compaction, but not in the docstore.
+            tombstones = self.segments.tombstones
+            index, ids, docstore, lexical, columns = self.segments.load(tombstones=tombstones)
+            self._set_rows(ids, columns, lexical, tombstones)
+            return self._wrap(index, ids, docstore)
+
+        if self.needs_migration:
+            # Never unpickled on the serving path; the migration tool converts it once.
+            logging.error(f"{self.path} holds a pickled FAISS store. Convert it with "
+                          f"'python -m app.vector_store.migrate_docstore --path {self.path}'.")
+        return None
 
-        if os.path.exists(index_path):
-            self.vector_store = FAISS.load_local(
-                folder_path=path,
-                embeddings=self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-        else:
-            self.vector_store = None
+    @property
+    def needs_migration(self) -> bool:
+        """Whether a pickled FAISS store is waiting for the migration tool.
+        Until it has run the store refuses writes, which would otherwise
+        leave the pickled chunks behind segments that never include them."""
+        return os.path.exists(os.path.join(self.path, "index.pkl"))
 
-    def add_documents(self, documents):
-        logging.info(f"Adding {len(documents)} documents to VectorStore.")
+    def _base_docstore(self, name):
+        """A docstore over the base segment ``name`` alone, as left by
+        ``write_base``, and that segment's documents."""
+        docs = self.segments.open_docs(name)
+        docstore = SegmentDocstore()
+        docstore.attach(docs, 0)
+        return docstore, docs
+
+    def embed_documents(self, documents):
+        logging.info(f"Embedding {len(documents)} documents.")
+        with span("embed"):
+            return self.embeddings.embed_documents([doc.page_content for doc in documents])
+
+    def _build_index(self, vectors, index_type=None, **options):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return build_index(
+            index_type or Config.FAISS_INDEX_TYPE,
+            vectors.shape[1],
+            train_vectors=vectors,
+            nlist=options.get("nlist", Config.FAISS_NLIST),
+            pq_m=options.get("pq_m", Config.FAISS_PQ_M),
+            hnsw_m=options.get("hnsw_m", Config.FAISS_HNSW_M),
+            max_train=Config.FAISS_TRAIN_SAMPLE,
+        )
+
+    def build_postings(self, documents):
+        """BM25 postings for documents about to be appended, numbered from the
+        next row of the index."""
+        with span("bm25_index"):
+            return self.lexical.build_segment([doc.page_content for doc in documents])
+
+    def add_embeddings(self, documents, vectors, ids=None, postings=None):
+        """Add documents to the in-memory index and return their postings.
+        Ingestion persists the segment first and passes its ``postings`` in,
+        so a failed write leaves memory untouched."""
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
         if self.vector_store is None:
-            self.vector_store = FAISS.from_documents(
-                documents,
-                embedding=self.embeddings
-            )
-        else:
-            self.vector_store.add_documents(documents)
+            # Trained types start flat: the first batch is too small a sample.
+            # Compaction switches once there are enough vectors.
+            index_type = "flat" if Config.FAISS_INDEX_TYPE in TRAINED_INDEX_TYPES else None
+            self._vector_store = self._wrap(self._build_index(vectors, index_type=index_type), [], SegmentDocstore())
+        if postings is None:
+            postings = self.build_postings(documents)
+        with self._index_lock.write(), span("faiss_add"):
+            start = self._vector_store.index.ntotal
+            self._vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+            self._row_of.update((id_, row) for row, id_ in enumerate(ids or [], start))
+            self.lexical.add_segment(postings)
+            self.columns.append(metadatas)
+            self.version += 1
+        return postings
+
+    def has_file(self, file_hash):
+        return self.registry.has_file(file_hash)
+
+    def _has_chunk(self, hash_):
+        if self.registry.has_chunk(hash_):
+            return True
+        # Covers chunks persisted to the index before the registry was saved.
+        return self.vector_store is not None and isinstance(self.vector_store.docstore.search(hash_), Document)
+
+    def _rebuild_locked(self, index_type, **options):
+        """Rebuild from the live rows, which also drops deleted ones."""
+        ids, documents = self._snapshot()
+        dim = self._vector_store.index.d
+        # With every row deleted, this writes an empty index of the same dimension.
+        vectors = np.asarray(self.embeddings.embed_documents([doc.page_content for doc in documents]) if documents
+                             else [], dtype=np.float32).reshape(len(documents), dim)
+        index = self._build_index(vectors, index_type=index_type, **options)
+        index.add(vectors)
+        postings = PostingsSegment.merge(self.lexical.segments, live=self._live_mask(self._vector_store.index.ntotal))
+        # Written first, so the new store reads its documents from the new base.
+        docstore, docs = self._base_docstore(self.segments.write_base(index, ids, documents, postings))
+        store = self._wrap(index, ids, docstore)
+        with self._index_lock.write():
+            self._vector_store = store
+            self._set_rows(ids, docs.columns, LexicalIndex([postings]))
+            self.version += 1
+        logging.info(f"Rebuilt index at {self.path} as {index_type_of(index)} with {index.ntotal} vectors.")
 
-        self.vector_store.save_local(self.path)
+    def rebuild(self, index_type, **options):
+        """Rebuild the whole index as ``index_type`` and commit it as the new base
+        segment. Vectors come from the embedding cache, so no model compute is
+        needed for content that was already embedded."""
+        with self._write_lock:
+            if self.vector_store is None:
+                return
+            with span("rebuild"):
+                self._rebuild_locked(index_type, **options)
+                self.registry.checkpoint()
 
-    def similarity_search(self, query, k=4):
+    def _compact_locked(self):
+        logging.info(f"Compacting {self.segments.num_deltas} delta segments and "
+                     f"{len(self._tombstones)} deleted rows at {self.path}")
+        target = Config.FAISS_INDEX_TYPE
+        index = self._vector_store.index
+        current = index_type_of(index)
+        ntotal = index.ntotal - len(self._tombstones)
+        needed = min_train_vectors(target, Config.FAISS_NLIST or default_nlist(ntotal))
+        retrain = current == target and needs_retrain(index, ntotal, Config.FAISS_NLIST, Config.FAISS_RETRAIN_GROWTH)
+        if (current != target or retrain) and ntotal >= needed:
+            self._rebuild_locked(target)
+            return
+        if self._tombstones:
+            self._rebuild_locked(current)
+            return
+        ids, documents = self._snapshot()
+        name = self.segments.write_base(self._vector_store.index, ids, documents, self.lexical.compact())
+        # Off the delta files the new base replaced.
+        docstore, _ = self._base_docstore(name)
+        with self._index_lock.write():
+            self._vector_store.docstore = docstore
+
+    def compact(self):
+        """Fold every delta segment into a new base segment, switching to the
+        configured index type once there are enough vectors to train it, and
+        reclaim the rows of deleted documents. An IVF index is retrained with
+        more lists as the store grows (see ``FAISS_RETRAIN_GROWTH``)."""
+        with self._write_lock:
+            if self.vector_store is None or (self.segments.num_deltas == 0 and not self._tombstones):
+                return
+            with span("compact"):
+                self._compact_locked()
+                self.registry.checkpoint()
+
+    def _needs_compaction(self):
+        if self.segments.num_deltas >= Config.SEGMENT_COMPACT_THRESHOLD:
+            return True
+        store = self._vector_store
+        return bool(self._tombstones) and store is not None and \
+            len(self._tombstones) >= Config.TOMBSTONE_COMPACT_RATIO * store.index.ntotal
+
+    def _maybe_compact(self):
+        if self._compacting or not self._needs_compaction():
+            return
+        self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logging.error(f"Segment compaction failed: {e}")
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name="segment-compaction", daemon=True).start()
+
+    def _add_batch(self, batch, seen, hashes, file_metadata=None):
+        new_docs, new_ids = [], []
+        for doc in batch:
+            hash_ = chunk_hash(doc.page_content)
+            if hash_ in seen:
+                continue
+            seen.add(hash_)
+            hashes.append(hash_)
+            if not self._has_chunk(hash_):
+                if file_metadata:
+                    doc.metadata.update(file_metadata)
+                new_docs.append(doc)
+                new_ids.append(hash_)
+        if new_docs:
+            return new_ids, new_docs, self.embed_documents(new_docs)
+        return new_ids, new_docs, None
+
+    def add_documents(self, documents, on_stage=None, file_hash=None, filename=None, batch_size=None,
+                      replace=False):
+        """Embed, index and persist documents, skipping content already indexed.
+
+        ``documents`` may be any iterable, including a generator still parsing
+        the file: it is consumed ``batch_size`` chunks at a time and each batch
+        is committed as its own segment. ``on_stage`` is called with "embed" and
+        "persist" around each batch and "parse" while waiting for the next one.
+        With ``replace``, earlier documents with the same filename are deleted
+        once this one is indexed. Returns the number of new and skipped chunks
+        and the ids of replaced documents.
+        """
+        if self.needs_migration:
+            raise UnmigratedStoreError(f"{self.path} holds a pickled FAISS store; convert it with "
+                                       f"'python -m app.vector_store.migrate_docstore' before adding documents.")
+        if file_hash and self.registry.has_file(file_hash):
+            logging.info(f"File {file_hash} already indexed, skipping.")
+            entry = self.registry.get_file(file_hash)
+            return {"duplicate_file": True, "new_chunks": 0, "skipped_chunks": len(entry["chunks"])}
+
+        batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        # Stamped on every new chunk so searches can be filtered by document.
+        file_metadata = {"document_id": file_hash, "filename": filename, "uploaded_at": time.time()} if file_hash else None
+        iterator = iter(documents)
+        hashes, seen = [], set()
+        total, new_total = 0, 0
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                break
+            total += len(batch)
+            with self._write_lock:
+                if on_stage:
+                    on_stage("embed")
+                new_ids, new_docs, vectors = self._add_batch(batch, seen, hashes, file_metadata)
+                if on_stage:
+                    on_stage("persist")
+                if new_docs:
+                    # Loads the existing segments, if not yet, before this one joins them.
+                    self.vector_store
+                    postings = self.build_postings(new_docs)
+                    with span("persist"):
+                        name = self.segments.append(vectors, new_ids, new_docs, postings)
+                    # Only once the segment is committed, so memory never holds
+                    # rows the disk does not.
+                    self.add_embeddings(new_docs, vectors, ids=new_ids, postings=postings)
+                    # The batch is on disk now; stop holding its texts in memory.
+                    self._vector_store.docstore.attach(self.segments.open_docs(name), self._row_of[new_ids[0]])
+                    new_total += len(new_docs)
+            if on_stage:
+                on_stage("parse")
+
+        with self._write_lock:
+            # A concurrent upload of the same file may have registered it since
+            # the check above; its chunks are the ones just skipped.
+            if file_hash and self.registry.has_file(file_hash):
+                logging.info(f"File {file_hash} was indexed concurrently, skipping.")
+                return {"duplicate_file": True, "new_chunks": new_total, "skipped_chunks": total - new_total}
+            if file_hash:
+                self.registry.register_file(file_hash, filename, hashes, uploaded_at=file_metadata["uploaded_at"])
+            else:
+                self.registry.register_chunks(hashes)
+            self.registry.save()
+        logging.info(f"Added {new_total} new chunks to VectorStore, {total - new_total} already indexed.")
+
+        # Only once the new version is searchable, so the document never disappears.
+        replaced = []
+        if replace and file_hash and filename:
+            for other in self.registry.files_named(filename):
+                if other != file_hash and self.delete_document(other) is not None:
+                    replaced.append(other)
+        self._maybe_compact()
+        return {
+            "duplicate_file": False,
+            "new_chunks": new_total,
+            "skipped_chunks": total - new_total,
+            "replaced_documents": replaced,
+        }
+
+    def delete_document(self, file_hash):
+        """Remove a document added with ``file_hash``.
+
+        Its chunks are tombstoned rather than removed from the index: they are
+        dropped from the docstore, excluded from every search and reclaimed by
+        the next compaction, which is started once tombstones make up
+        ``TOMBSTONE_COMPACT_RATIO`` of the index. Chunks shared with other
+        documents stay, re-stamped with the metadata of one of them if they
+        carried this document's. Returns None for unknown documents.
+        """
+        with self._write_lock:
+            entry = self.registry.get_file(file_hash)
+            if entry is None:
+                return None
+            store = self.vector_store
+            released = self.registry.unregister_file(file_hash)
+            rows = [self._row_of[h] for h in released if h in self._row_of]
+            kept = set(entry["chunks"]).difference(released)
+            updates = self._reassign(file_hash, kept) if store is not None and kept else {}
+            if rows or updates:
+                with self._index_lock.write():
+                    self._tombstones.update(rows)
+                    self._live = None
+                    for h in released:
+                        self._row_of.pop(h, None)
+                    store.docstore.delete(released)
+                    for h, metadata in updates.items():
+                        self.columns.update([self._row_of[h]], metadata)
+                    store.docstore.update_metadata(updates)
+                    self.version += 1
+                self.segments.add_tombstones(rows, released, updates)
+            self.registry.save()
+        logging.info(f"Deleted document {file_hash} ({entry['filename']}): {len(rows)} chunks removed, "
+                     f"{len(entry['chunks']) - len(released)} shared chunks kept.")
+        self._maybe_compact()
+        return {
+            "document_id": file_hash,
+            "filename": entry["filename"],
+            "deleted_chunks": len(rows),
+            "retained_chunks": len(entry["chunks"]) - len(released),
+        }
+
+    def _reassign(self, file_hash, hashes):
+        """Metadata updates moving the chunks in ``hashes`` still stamped with
+        the deleted ``file_hash`` to the latest document that contains them,
+        so filters on either document id stay right; e.g. the chunks a new
+        version of a file shares with the one it replaces."""
+        hashes = [h for h in hashes if h in self._row_of]
+        stamped = self.columns.has_value("document_id", [self._row_of[h] for h in hashes], file_hash)
+        hashes = [h for h, is_stamped in zip(hashes, stamped) if is_stamped]
+        updates = {}
+        for h, owner in self.registry.owners(hashes).items():
+            entry = self.registry.get_file(owner)
+            metadata = {"document_id": owner, "filename": entry["filename"], "uploaded_at": entry.get("uploaded_at")}
+            updates[h] = {field: value for field, value in metadata.items() if value is not None}
+        return updates
+
+    def _live_mask(self, num_rows):
+        """Rows not deleted, or None when nothing is. Cached until the next delete."""
+        if not self._tombstones:
+            return None
+        live = self._live
+        if live is None or len(live) != num_rows:
+            live = np.ones(num_rows, dtype=bool)
+            live[list(self._tombstones)] = False
+            self._live = live
+        return live
+
+    def _filter_mask(self, filter, num_rows):
+        # Called with the index lock held, so the mask matches the index rows.
+        mask = None if not filter else self.columns.mask(filter)
+        live = self._live_mask(num_rows)
+        if live is not None:
+            mask = live if mask is None else mask & live
+        return mask
+
+    def _exact_rows(self, store, vectors, rows, k):
+        """Exact L2 search over a few rows, with vectors from the embedding
+        cache; one list of rows per query vector. Returns None if any of the
+        rows is not cached."""
+        ids = [store.index_to_docstore_id[row] for row in rows]
+        cached = self.embeddings.cache.get_many(ids)
+        if len(cached) < len(ids):
+            return None
+        candidates = np.stack([cached[id_] for id_ in ids])
+        # |v - c|^2 expanded, so memory is queries x rows rather than x dim too.
+        distances = (vectors ** 2).sum(axis=1)[:, None] + (candidates ** 2).sum(axis=1)[None, :] \
+            - 2 * vectors @ candidates.T
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return [[int(rows[i]) for i in query_order] for query_order in order]
+
+    def _dense_ids(self, embedding, k, nprobe=None, ef_search=None, filter=None):
+        return self._dense_ids_many([embedding], k, nprobe, ef_search, filter)[0]
+
+    def _dense_ids_many(self, embeddings, k, nprobe=None, ef_search=None, filter=None):
+        """Docstore ids of the ``k`` nearest chunks for each embedding, from one
+        multi-row index search."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        empty = [[] for _ in range(len(vectors))]
+        nprobe = nprobe or Config.FAISS_NPROBE
+        ef_search = ef_search or Config.FAISS_EF_SEARCH
+        with self._index_lock.read():
+            # Rows are resolved to docstore ids under the lock: compaction
+            # renumbers them.
+            store = self._vector_store
+            if store is None or not len(vectors):
+                return empty
+            selector, bitmap = None, None
+            mask = self._filter_mask(filter, store.index.ntotal)
+            if mask is not None:
+                rows = np.flatnonzero(mask)
+                if not len(rows):
+                    return empty
+                if filter and len(rows) <= Config.FILTER_EXACT_MAX:
+                    exact = self._exact_rows(store, vectors, rows, k)
+                    if exact is not None:
+                        return [[store.index_to_docstore_id[row] for row in found] for found in exact]
+                # Only selected rows are scored. The fewer rows pass the
+                # filter, the more lists/neighbours are visited to still find k.
+                bitmap = np.packbits(mask, bitorder="little")
+                selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                scale = store.index.ntotal / len(rows)
+                nprobe = math.ceil(nprobe * scale)
+                ef_search = min(math.ceil(ef_search * scale), max(ef_search, store.index.ntotal))
+            params = search_parameters(store.index, nprobe=nprobe, ef_search=ef_search, selector=selector)
+            _, found = store.index.search(vectors, k, params=params)
+            return [[store.index_to_docstore_id[int(row)] for row in rows if row != -1] for rows in found]
+
+    def _lexical_ids(self, query, k, filter=None):
+        with self._index_lock.read():
+            store = self._vector_store
+            if store is None:
+                return []
+            mask = self._filter_mask(filter, store.index.ntotal)
+            return [store.index_to_docstore_id[row] for row, _ in self.lexical.search(query, k, mask=mask)]
+
+    def _documents(self, ids):
+        store = self._vector_store
+        if store is None:
+            return []
+        documents = (store.docstore.search(id_) for id_ in ids)
+        # Skips documents deleted since the search.
+        return [doc for doc in documents if isinstance(doc, Document)]
+
+    def similarity_search_by_vector(self, embedding, k=4, nprobe=None, ef_search=None, filter=None):
+        return self._documents(self._dense_ids(embedding, k, nprobe, ef_search, filter))
+
+    def similarity_search(self, query, k=4, nprobe=None, ef_search=None, filter=None):
+        """Dense search. ``filter`` restricts it to chunks whose metadata match
+        (see ``MetadataColumns``) before vectors are compared."""
+        if self.vector_store is None:
+            return []
+        embedding = self.embeddings.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k=k, nprobe=nprobe, ef_search=ef_search, filter=filter)
+
+    def lexical_search(self, query, k=4, filter=None):
+        """BM25 search over the chunk texts."""
+        if self.vector_store is None:
+            return []
+        return self._documents(self._lexical_ids(query, k, filter))
+
+    def hybrid_search(self, query, k=4, fetch_k=None, rrf_k=None, nprobe=None, ef_search=None, filter=None):
+        """Fuse the top ``fetch_k`` dense and BM25 results with reciprocal rank
+        fusion. Catches exact identifiers and rare terms the embedding misses."""
         if self.vector_store is None:
             return []
-        return self.vector_store.similarity_search(query, k=k)
+        fetch_k = max(k, fetch_k or Config.HYBRID_FETCH_K)
+        embedding = self.embeddings.embed_query(query)
+        dense = self._dense_ids(embedding, fetch_k, nprobe, ef_search, filter)
+        lexical = self._lexical_ids(query, fetch_k, filter)
+        return self._documents(reciprocal_rank_fusion([dense, lexical], k=rrf_k or Config.RRF_K)[:k])
+
+    def search(self, query, k=4, mode=None, filter=None):
+        """Search with ``mode`` "dense", "lexical" or "hybrid" (default
+        ``Config.RETRIEVAL_MODE``), optionally restricted by a metadata filter."""
+        mode = mode or Config.RETRIEVAL_MODE
+        if mode == "dense":
+            return self.similarity_search(query, k=k, filter=filter)
+        if mode == "lexical":
+            return self.lexical_search(query, k=k, filter=filter)
+        if mode == "hybrid":
+            return self.hybrid_search(query, k=k, filter=filter)
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    def search_batch(self, queries, k=4, mode=None, filter=None):
+        """``search`` for many queries at once: the queries are embedded in one
+        batch and the dense stage is a single multi-row index search. Returns
+        one list of documents per query, in order."""
+        mode = mode or Config.RETRIEVAL_MODE
+        if mode not in ("dense", "lexical", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if self.vector_store is None or not queries:
+            return [[] for _ in queries]
+        if mode == "lexical":
+            return [self._documents(self._lexical_ids(query, k, filter)) for query in queries]
+
+        embeddings = embed_queries(self.embeddings, list(queries))
+        if mode == "dense":
+            return [self._documents(ids) for ids in self._dense_ids_many(embeddings, k, filter=filter)]
+        fetch_k = max(k, Config.HYBRID_FETCH_K)
+        dense = self._dense_ids_many(embeddings, fetch_k, filter=filter)
+        return [
+            self._documents(reciprocal_rank_fusion([ids, self._lexical_ids(query, fetch_k, filter)], k=Config.RRF_K)[:k])
+            for query, ids in zip(queries, dense)
+        ]
 
     def as_retriever(self, search_kwargs=None):
         if self.vector_store is None:
             raise RuntimeError("Vector store not initialized. Add documents first.")
         if search_kwargs is None:
             search_kwargs = {"k": 4}
-        return self.vector_store.as_retriever(search_kwargs=search_kwargs)
\ No newline at end of file
+        return self.vector_store.as_retriever(search_kwargs=search_kwargs)
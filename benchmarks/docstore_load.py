@@ -0,0 +1,171 @@
+"""Load time, resident memory and hit-fetch latency of the docstore layouts,
+on a synthetic store of ``--chunks`` chunks:
+
+    python -m benchmarks.docstore_load --chunks 100000 --json docstore.json
+
+* ``pickle``: LangChain ``FAISS.save_local``/``load_local``, the original format.
+* ``jsonl``: segments with every document parsed into an in-memory docstore
+  at load, the previous layout.
+* ``mmap``: ``VectorStore`` over the memory-mapped segment docstore.
+
+Each layout is loaded in a fresh process, so RSS is not shared between them.
+Vectors are random; no embedding model is loaded.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+RESULT_PREFIX = "RESULT "
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def build(directory: str, chunks: int, dim: int, seed: int = 0):
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from app.vector_store.lexical_index import PostingsSegment
+    from app.vector_store.segment_store import SegmentStore
+    from benchmarks.offline.corpus import make_pages
+
+    rng = random.Random(seed)
+    texts = make_pages(rng, 0, chunks, 160)
+    ids = [f"{i:064x}" for i in range(chunks)]
+    documents = [
+        Document(id=id_, page_content=text, metadata={
+            "source": f"uploads/doc_{i // 100:05d}.pdf", "page": i % 100, "chunk_id": f"p{i % 100}-c0",
+            "document_id": f"{i // 100:064x}", "filename": f"doc_{i // 100:05d}.pdf", "uploaded_at": 1.7e9 + i // 100,
+        })
+        for i, (id_, text) in enumerate(zip(ids, texts))
+    ]
+    vectors = np.random.default_rng(seed).standard_normal((chunks, dim)).astype(np.float32)
+    index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+
+    SegmentStore(os.path.join(directory, "segments_store")).write_base(
+        index, ids, documents, PostingsSegment.from_texts(0, texts)
+    )
+    FAISS(embedding_function=DeterministicFakeEmbedding(size=dim), index=index, docstore=InMemoryDocstore(dict(zip(ids, documents))),
+          index_to_docstore_id=dict(enumerate(ids))).save_local(os.path.join(directory, "pickle_store"))
+    return ids
+
+
+def load(layout: str, directory: str):
+    """Load ``layout`` and return a function fetching a document by id."""
+    if layout == "pickle":
+        from langchain_community.vectorstores import FAISS
+        store = FAISS.load_local(os.path.join(directory, "pickle_store"), embeddings=None,
+                                 allow_dangerous_deserialization=True)
+        return store, store.docstore.search
+
+    path = os.path.join(directory, "segments_store")
+    if layout == "jsonl":
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_core.documents import Document
+        from app.vector_store.lexical_index import PostingsSegment
+        from app.vector_store.metadata_store import MetadataColumns
+        from app.vector_store.segment_store import SegmentStore
+        segments = SegmentStore(path)
+        base = segments.manifest["base"]
+        index = faiss.read_index(os.path.join(segments.dir, f"{base}.faiss"))
+        documents = {}
+        with open(os.path.join(segments.dir, f"{base}.docs.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                documents[record["id"]] = Document(id=record["id"], page_content=record["page_content"],
+                                                   metadata=record["metadata"])
+        postings = PostingsSegment.load(os.path.join(segments.dir, f"{base}.lex.npz"))
+        columns = MetadataColumns([doc.metadata for doc in documents.values()])
+        docstore = InMemoryDocstore(documents)
+        return (index, postings, columns, docstore), docstore.search
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from app.vector_store.vector_store import VectorStore
+    store = VectorStore(path, embeddings=DeterministicFakeEmbedding(size=8))
+    return store, store.vector_store.docstore.search
+
+
+def child(layout: str, directory: str, ids_path: str, fetches: int, k: int):
+    # Imported before the baseline, so only the load itself is measured.
+    import faiss  # noqa: F401
+    import langchain_community.vectorstores  # noqa: F401
+    import app.vector_store.vector_store  # noqa: F401
+    with open(ids_path, encoding="utf-8") as f:
+        ids = f.read().split()
+    before = rss_mb()
+    start = time.perf_counter()
+    store, fetch = load(layout, directory)
+    load_seconds = time.perf_counter() - start
+    after = rss_mb()
+
+    rng = random.Random(1)
+    latencies = []
+    for _ in range(fetches):
+        hits = rng.sample(ids, k)
+        start = time.perf_counter()
+        for id_ in hits:
+            fetch(id_)
+        latencies.append((time.perf_counter() - start) * 1000)
+    # Prefixed: the app logger writes to stdout too.
+    print(RESULT_PREFIX + json.dumps({
+        "load_seconds": load_seconds,
+        "rss_mb": after - before,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "fetch_top_k_p50_ms": float(np.percentile(latencies, 50)),
+        "fetch_top_k_p95_ms": float(np.percentile(latencies, 95)),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Docstore load time, RSS and fetch latency by layout.")
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=4, help="Documents fetched per search")
+    parser.add_argument("--fetches", type=int, default=1000)
+    parser.add_argument("--dir", help="Where to build the stores (default: a temp dir)")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.dir, os.path.join(args.dir, "ids.txt"), args.fetches, args.k)
+        return
+
+    directory = os.path.abspath(args.dir or tempfile.mkdtemp(prefix="rag_docstore_bench_"))
+    start = time.perf_counter()
+    ids = build(directory, args.chunks, args.dim)
+    with open(os.path.join(directory, "ids.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(ids))
+    print(f"Built {args.chunks} chunks in {directory} in {time.perf_counter() - start:.1f}s")
+
+    result = {"chunks": args.chunks, "dim": args.dim, "k": args.k, "layouts": {}}
+    for layout in ("pickle", "jsonl", "mmap"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.docstore_load", "--child", layout, "--dir", directory,
+             "--fetches", str(args.fetches), "--k", str(args.k)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        row = json.loads(next(line for line in output.splitlines() if line.startswith(RESULT_PREFIX))[len(RESULT_PREFIX):])
+        result["layouts"][layout] = row
+        print(f"{layout:>8}  load {row['load_seconds']:7.3f}s  RSS +{row['rss_mb']:8.1f} MB  "
+              f"fetch top-{args.k} p50 {row['fetch_top_k_p50_ms']:.3f} ms  p95 {row['fetch_top_k_p95_ms']:.3f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Compare embedding backends: document throughput, query latency, and how
+much retrieval changes when queries are embedded by another backend than
+the one the index was built with.
+
+    python -m benchmarks.embedding_backends --backends torch onnx onnx-int8 --path faiss_store
+
+The first backend is the reference: its document vectors form the index, and
+recall@k is the overlap between the top k found with each backend's query
+vectors and the top k found with the reference's. Without ``--path`` a
+synthetic corpus is used.
+"""
+import argparse
+import json
+import random
+import time
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from sentence_transformers import SentenceTransformer
+from app.config import Config
+from app.vector_store.embedding_backends import PROBE_TEXTS, model_kwargs
+from benchmarks.hybrid_search import percentiles
+
+
+def corpus_texts(path: str, num_docs: int, seed: int = 0):
+    rng = random.Random(seed)
+    if path:
+        from app.vector_store.vector_store import VectorStore
+
+        store = VectorStore(path=path).vector_store
+        if store is None:
+            raise SystemExit(f"No index found at {path}")
+        documents = [store.docstore.search(id_) for id_ in store.index_to_docstore_id.values()]
+        texts = [doc.page_content for doc in documents if isinstance(doc, Document)]  # skips deleted rows
+        return rng.sample(texts, min(num_docs, len(texts)))
+    words = " ".join(PROBE_TEXTS).split()
+    return [" ".join(rng.choices(words, k=rng.randint(40, 120))) for _ in range(num_docs)]
+
+
+def sample_queries(texts, num_queries: int, seed: int = 1):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        words = rng.choice(texts).split()
+        start = rng.randrange(max(1, len(words) - 6))
+        queries.append(" ".join(words[start:start + 6]))
+    return queries
+
+
+def unit(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def measure(backend: str, model_file: str, texts, queries, batch_size: int) -> dict:
+    start = time.perf_counter()
+    model = SentenceTransformer(Config.EMBEDDING_MODEL, device="cpu", **model_kwargs(backend, model_file))
+    load_seconds = time.perf_counter() - start
+    model.encode(texts[:batch_size], batch_size=batch_size, show_progress_bar=False)  # warm up
+
+    start = time.perf_counter()
+    doc_vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+    doc_seconds = time.perf_counter() - start
+
+    latencies, query_vectors = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(model.encode([query], show_progress_bar=False, convert_to_numpy=True)[0])
+        latencies.append(time.perf_counter() - start)
+    return {
+        "load_seconds": load_seconds,
+        "docs_per_second": len(texts) / doc_seconds,
+        "query_latency": percentiles(latencies),
+        "doc_vectors": unit(doc_vectors),
+        "query_vectors": unit(query_vectors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend throughput, latency and recall.")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model-file", help="Exported model file for the onnx backends")
+    parser.add_argument("--path", help="Take documents from this vector store instead of a synthetic corpus")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=Config.EMBED_BATCH_SIZE)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    texts = corpus_texts(args.path, args.docs)
+    queries = sample_queries(texts, args.queries)
+    runs = {backend: measure(backend, args.model_file, texts, queries, args.batch_size) for backend in args.backends}
+
+    k = min(args.k, len(texts))
+    reference = runs[args.backends[0]]
+    index = faiss.IndexFlatIP(reference["doc_vectors"].shape[1])
+    index.add(reference["doc_vectors"])
+    _, expected = index.search(reference["query_vectors"], k)
+
+    result = {"model": Config.EMBEDDING_MODEL, "docs": len(texts), "queries": len(queries), "k": k, "backends": {}}
+    for backend, run in runs.items():
+        _, found = index.search(run["query_vectors"], k)
+        recall = np.mean([len(set(f) & set(e)) / k for f, e in zip(found, expected)])
+        cosine = (run["doc_vectors"] * reference["doc_vectors"]).sum(axis=1)
+        result["backends"][backend] = {
+            "load_seconds": run["load_seconds"],
+            "docs_per_second": run["docs_per_second"],
+            "query_latency": run["query_latency"],
+            f"recall_at_{k}": float(recall),
+            "min_cosine": float(cosine.min()),
+            "mean_cosine": float(cosine.mean()),
+        }
+        stats = result["backends"][backend]
+        print(f"{backend:>10}  {stats['docs_per_second']:8.1f} docs/s  query p50 {stats['query_latency']['p50_ms']:6.2f} ms"
+              f"  p95 {stats['query_latency']['p95_ms']:6.2f} ms  recall@{k} {recall:.3f}"
+              f"  min cosine {stats['min_cosine']:.4f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Compare query latency of dense, BM25 and fused (RRF) retrieval.
+
+Against an existing store (query embeddings are computed once up front, so
+only retrieval is timed):
+
+    python -m benchmarks.hybrid_search --path faiss_store --queries 200
+
+Or on a synthetic corpus with random unit vectors, to see how the lexical
+index scales with the number of chunks:
+
+    python -m benchmarks.hybrid_search --synthetic 1000000 --dim 384
+"""
+import argparse
+import io
+import json
+import random
+import shutil
+import tempfile
+import time
+import numpy as np
+from langchain_core.documents import Document
+from app.config import Config
+from app.vector_store.lexical_index import reciprocal_rank_fusion
+from app.vector_store.vector_store import VectorStore
+
+VOCABULARY_SIZE = 20000
+
+
+def synthetic_corpus(vector_store: VectorStore, num_chunks: int, dim: int, batch_size: int = 10000, seed: int = 0):
+    """Fill ``vector_store`` with random chunks: Zipf-distributed words plus one
+    part number per chunk, with random unit vectors."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"w{i}" for i in range(VOCABULARY_SIZE)], dtype=object)
+    postings_bytes = 0
+    for start in range(0, num_chunks, batch_size):
+        count = min(batch_size, num_chunks - start)
+        words = vocabulary[np.minimum(rng.zipf(1.3, size=(count, 150)), VOCABULARY_SIZE) - 1]
+        documents = [
+            Document(page_content=" ".join(row) + f" part PN-{start + i:08d}")
+            for i, row in enumerate(words)
+        ]
+        vectors = rng.standard_normal((count, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [f"synthetic-{start + i}" for i in range(count)]
+        postings = vector_store.add_embeddings(documents, vectors, ids=ids)
+        buffer = io.BytesIO()
+        postings.save(buffer)
+        postings_bytes += buffer.tell()
+        print(f"  {start + count:>10} chunks indexed")
+    return postings_bytes
+
+
+def sample_queries(vector_store: VectorStore, num_queries: int, seed: int = 0):
+    """Queries are short word sequences taken from random chunks, so both
+    retrievers have something to find."""
+    store = vector_store.vector_store
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        row = rng.randrange(store.index.ntotal)
+        words = store.docstore.search(store.index_to_docstore_id[row]).page_content.split()
+        start = rng.randrange(max(1, len(words) - 4))
+        queries.append(" ".join(words[start:start + 4]))
+    return queries
+
+
+def percentiles(latencies) -> dict:
+    latencies_ms = np.array(latencies) * 1000
+    return {f"p{p}_ms": float(np.percentile(latencies_ms, p)) for p in (50, 95, 99)}
+
+
+def run(vector_store: VectorStore, queries, embeddings, k: int, fetch_k: int, rrf_k: int) -> dict:
+    timings = {"dense": [], "lexical": [], "hybrid": []}
+    for query, embedding in zip(queries, embeddings):
+        start = time.perf_counter()
+        vector_store._dense_ids(embedding, k)
+        timings["dense"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        vector_store._lexical_ids(query, k)
+        timings["lexical"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        dense = vector_store._dense_ids(embedding, fetch_k)
+        lexical = vector_store._lexical_ids(query, fetch_k)
+        reciprocal_rank_fusion([dense, lexical], k=rrf_k)[:k]
+        timings["hybrid"].append(time.perf_counter() - start)
+    return {mode: percentiles(latencies) for mode, latencies in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense vs BM25 vs hybrid retrieval latency.")
+    parser.add_argument("--path", default="faiss_store", help="Existing vector store directory")
+    parser.add_argument("--synthetic", type=int, default=0, help="Build a synthetic store with this many chunks")
+    parser.add_argument("--dim", type=int, default=384, help="Vector size for --synthetic")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=Config.HYBRID_FETCH_K)
+    parser.add_argument("--rrf-k", type=int, default=Config.RRF_K)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    try:
+        result = {}
+        if args.synthetic:
+            tmp_dir = tempfile.mkdtemp(prefix="hybrid_bench_")
+            vector_store = VectorStore(path=tmp_dir)
+            start = time.perf_counter()
+            result["postings_bytes"] = synthetic_corpus(vector_store, args.synthetic, args.dim)
+            result["index_seconds"] = time.perf_counter() - start
+        else:
+            vector_store = VectorStore(path=args.path)
+            if vector_store.vector_store is None:
+                parser.error(f"No index found at {args.path}")
+
+        queries = sample_queries(vector_store, args.queries)
+        if args.synthetic:
+            embeddings = np.random.default_rng(1).standard_normal((len(queries), args.dim)).astype(np.float32)
+        else:
+            embeddings = [vector_store.embeddings.embed_query(query) for query in queries]
+
+        result.update({
+            "chunks": vector_store.vector_store.index.ntotal,
+            "terms": sum(len(segment.terms) for segment in vector_store.lexical.segments),
+            "postings": sum(len(segment.doc_ids) for segment in vector_store.lexical.segments),
+            "latency": run(vector_store, queries, embeddings, args.k, args.fetch_k, args.rrf_k),
+        })
+        print(f"{result['chunks']} chunks, {result['terms']} terms, {result['postings']} postings"
+              + (f", {result['postings_bytes'] / 2 ** 20:.1f} MB of postings on disk" if args.synthetic else ""))
+        for mode, stats in result["latency"].items():
+            print(f"{mode:>8}  p50 {stats['p50_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms  "
+                  f"p99 {stats['p99_ms']:8.3f} ms")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
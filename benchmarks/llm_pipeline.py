@@ -0,0 +1,143 @@
+"""LLM calls and latency per question for the answer pipelines, offline:
+
+    python -m benchmarks.llm_pipeline --files 10 --queries 50 --llm-latency-ms 300
+
+* ``legacy``: the call sequence of the previous ``LLmService.generate_response``
+  (refine, retrieve, refine again, ConversationalRetrievalChain answer, final
+  prompt), replayed with the same model and store. The old class itself no
+  longer ran: its memory and chain imports were commented out.
+* ``graph``: ``/query`` with ``CHAT_PIPELINE=graph`` (tool call, then answer).
+* ``service``: ``/query`` with ``CHAT_PIPELINE=service``, first with new
+  questions and then with the same ones again (refinement memoized).
+
+The chat model is ``FakeChatModel`` with ``--llm-latency-ms`` per call, so the
+numbers show the effect of the number and ordering of calls, not of Groq.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+import httpx
+from benchmarks.offline.corpus import generate_corpus, sample_queries
+from benchmarks.offline.fake_llm import FakeChatModel
+from benchmarks.offline.run import ingest, percentiles
+
+CALLS = {"count": 0}
+
+
+class CountingChatModel(FakeChatModel):
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        CALLS["count"] += 1
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        CALLS["count"] += 1
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+
+
+async def legacy_answer(app_module, query: str) -> str:
+    from services.llm_service import ANSWER_PROMPT, REFINE_PROMPT
+    llm = app_module.llm_service.llm
+    vector_store = app_module.collections.get()
+
+    def retrieve(text):
+        return [doc for doc, _ in app_module.search_documents(vector_store, text, k=4)]
+
+    refined = (await llm.ainvoke(REFINE_PROMPT.format(query=query))).text
+    documents = await asyncio.to_thread(retrieve, refined)
+    refined = (await llm.ainvoke(REFINE_PROMPT.format(query=query))).text
+    context = "\n\n".join(doc.page_content for doc in documents)
+    # ConversationalRetrievalChain: its own retrieval, then one answer call
+    # (no question-condensing call, as memory started empty per request).
+    chain_documents = await asyncio.to_thread(retrieve, refined)
+    chain_context = "\n\n".join(doc.page_content for doc in chain_documents)
+    await llm.ainvoke(ANSWER_PROMPT.format(context=chain_context, memory="", query=refined))
+    return (await llm.ainvoke(ANSWER_PROMPT.format(context=context, memory="", query=refined))).text
+
+
+async def measure(name: str, answer, queries, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await answer(query)
+            latencies.append(time.perf_counter() - start)
+
+    CALLS["count"] = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    elapsed = time.perf_counter() - start
+    result = {
+        "llm_calls_per_query": CALLS["count"] / len(queries),
+        "throughput_rps": len(queries) / elapsed,
+        **percentiles(latencies),
+    }
+    print(f"{name:>14}  {result['llm_calls_per_query']:5.2f} LLM calls/query  "
+          f"p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  {result['throughput_rps']:7.2f} req/s")
+    return result
+
+
+async def run(app_module, paths, queries, args) -> dict:
+    from app.config import Config
+    transport = httpx.ASGITransport(app=app_module.app)
+    # ASGITransport does not send lifespan events; the startup hooks compile the graph.
+    async with app_module.app.router.lifespan_context(app_module.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        await ingest(client, paths, concurrency=4)
+
+        async def query(text):
+            response = await client.post("/query", data={"query": text, "session_id": uuid.uuid4().hex,
+                                                         "no_cache": "true"})
+            response.raise_for_status()
+
+        result = {"legacy": await measure("legacy", lambda q: legacy_answer(app_module, q), queries,
+                                          args.concurrency)}
+        Config.CHAT_PIPELINE = "graph"
+        result["graph"] = await measure("graph", query, queries, args.concurrency)
+        Config.CHAT_PIPELINE = "service"
+        result["service_cold"] = await measure("service cold", query, queries, args.concurrency)
+        result["service_warm"] = await measure("service warm", query, queries, args.concurrency)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM calls and latency per question, by answer pipeline.")
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="rag_llm_pipeline_bench_")
+    json_path = os.path.abspath(args.json) if args.json else None
+    paths = generate_corpus(os.path.join(work_dir, "corpus"), args.files, args.pages)
+    queries = sample_queries(args.files, args.pages, args.queries)
+
+    os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+    os.chdir(work_dir)
+    import app.main as app_module
+
+    llm = CountingChatModel(latency_ms=args.llm_latency_ms)
+    app_module.llm = llm
+    app_module.llm_with_tool = llm.bind_tools(app_module.tools)
+    app_module.llm_service.llm = llm
+
+    result = {"llm_latency_ms": args.llm_latency_ms, "concurrency": args.concurrency,
+              **asyncio.run(run(app_module, paths, queries, args))}
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {json_path}")
+    app_module.ingestion_queue.shutdown()
+
+
+if __name__ == "__main__":
+    main()
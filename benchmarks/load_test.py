@@ -0,0 +1,121 @@
+"""Measure /query throughput and latency at increasing client concurrency.
+
+Start the API, then e.g.:
+
+    python -m benchmarks.load_test --url http://localhost:8080 --concurrency 1 10 100 --requests 200
+    python -m benchmarks.load_test --queries-file questions.txt --turns 3
+
+Each virtual user sends its own ``session_id``, starting a new session every
+``--turns`` requests, and cycles through the queries, so requests neither
+share one conversation nor repeat one question. The answer cache is bypassed
+unless ``--cache`` is given, so the numbers measure the retrieval and LLM
+pipeline rather than cache hits.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+import uuid
+import httpx
+import numpy as np
+
+DEFAULT_QUERIES = [
+    "What is this document about?",
+    "Summarize the main findings.",
+    "Which methods or tools are described?",
+    "What are the key numbers mentioned?",
+    "Who are the people or organizations involved?",
+    "What limitations or risks are discussed?",
+    "What recommendations are made?",
+    "What dates or deadlines are mentioned?",
+]
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, queries, concurrency: int, total: int,
+                    turns: int = 1, cache: bool = False) -> dict:
+    latencies = []
+    errors = 0
+    remaining = total
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal remaining, errors
+        session_id, turn = None, turns
+        while remaining > 0:
+            remaining -= 1
+            if turn >= turns:
+                session_id, turn = uuid.uuid4().hex, 0
+            turn += 1
+            # The form's session_id takes precedence over the cookie the
+            # client jar shares between virtual users.
+            data = {"query": queries[next(counter) % len(queries)], "session_id": session_id}
+            if not cache:
+                data["no_cache"] = "true"
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, data=data)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.array([0.0])
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+async def run(url: str, endpoint: str, queries, levels, total: int, timeout: float, turns: int = 1,
+              cache: bool = False):
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        results = []
+        for concurrency in levels:
+            result = await run_level(client, endpoint, queries, concurrency, total, turns=turns, cache=cache)
+            print(f"{concurrency:>6} clients  {result['throughput_rps']:8.2f} req/s  "
+                  f"p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                  f"p99 {result['p99_ms']:8.1f} ms  errors {result['errors']}")
+            results.append(result)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the /query endpoint.")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--endpoint", default="/query")
+    parser.add_argument("--query", action="append", help="A query to send; repeat for several")
+    parser.add_argument("--queries-file", help="Queries to send, one per line")
+    parser.add_argument("--turns", type=int, default=1, help="Requests per session before a virtual user starts a new one")
+    parser.add_argument("--cache", action="store_true", help="Allow answers from the semantic answer cache")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    queries = list(args.query or [])
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries.extend(line.strip() for line in f if line.strip())
+    queries = queries or DEFAULT_QUERIES
+
+    results = asyncio.run(run(args.url, args.endpoint, queries, args.concurrency, args.requests, args.timeout,
+                              turns=max(1, args.turns), cache=args.cache))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
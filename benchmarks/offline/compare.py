@@ -0,0 +1,61 @@
+"""Compare two ``benchmarks.offline.run`` result files:
+
+    python -m benchmarks.offline.compare baseline.json candidate.json --threshold 10
+
+Prints every latency, throughput and size metric found in both, with the
+relative change, and exits with status 1 if any got worse by more than
+``--threshold`` percent.
+"""
+import argparse
+import json
+import sys
+
+# Metrics where a higher value is better; for every other one lower is better.
+HIGHER_IS_BETTER = ("throughput_rps", "per_second")
+TRACKED = HIGHER_IS_BETTER + ("_ms", "_bytes", "_mb", "seconds")
+
+
+def flatten(value, prefix=""):
+    """``{"query": [{"concurrency": 8, "p50_ms": 3.1}]}`` -> ``{"query[c=8].p50_ms": 3.1}``."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key not in ("meta", "args"):
+                yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            label = f"c={item['concurrency']}" if isinstance(item, dict) and "concurrency" in item else str(i)
+            yield from flatten(item, f"{prefix}[{label}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two offline benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression, in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = dict(flatten(json.load(f)))
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = dict(flatten(json.load(f)))
+
+    regressions = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        if not key.endswith(TRACKED):
+            continue
+        old, new = baseline[key], candidate[key]
+        change = (new - old) / old * 100 if old else 0.0
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = "  REGRESSION" if worse > args.threshold else ""
+        if flag:
+            regressions.append(key)
+        print(f"{key:<50} {old:14.3f} {new:14.3f} {change:+8.1f}%{flag}")
+    if regressions:
+        print(f"{len(regressions)} metrics regressed by more than {args.threshold}%.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
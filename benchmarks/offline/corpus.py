@@ -0,0 +1,95 @@
+"""Synthetic TXT and PDF corpora for the offline benchmarks.
+
+Pages are Zipf-distributed words from a fixed vocabulary plus a few part
+numbers, so dense and BM25 retrieval both have something to find, and
+everything is seeded, so the same arguments always give the same files.
+"""
+import os
+import random
+from typing import List
+
+VOCABULARY_SIZE = 5000
+LINE_WIDTH = 90
+
+
+def _zipf_words(rng: random.Random, count: int) -> List[str]:
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    return [f"w{i}" for i in rng.choices(range(VOCABULARY_SIZE), weights=weights, k=count)]
+
+
+def make_pages(rng: random.Random, file_index: int, num_pages: int, words_per_page: int) -> List[str]:
+    pages = []
+    for page in range(num_pages):
+        words = _zipf_words(rng, words_per_page)
+        for i in range(0, len(words), 50):
+            words[i] = f"PN-{file_index:04d}-{page:03d}-{i // 50}"
+        pages.append(" ".join(words))
+    return pages
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[str]):
+    """Write a minimal PDF with one page per string, in Helvetica, which
+    pypdf can extract the text of again."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # the page tree, once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        lines = [text[i:i + LINE_WIDTH] for i in range(0, len(text), LINE_WIDTH)]
+        stream = ("BT /F1 9 Tf 36 806 Td 11 TL " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET").encode("latin-1")
+        page_number, content_number = len(objects) + 1, len(objects) + 2
+        kids.append(f"{page_number} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {content_number} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer << /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(directory: str, num_files: int, pages_per_file: int = 10, words_per_page: int = 400,
+                    pdf_fraction: float = 0.5, seed: int = 0) -> List[str]:
+    """Write ``num_files`` files to ``directory``, about ``pdf_fraction`` of
+    them PDFs and the rest TXT, and return their paths."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for file_index in range(num_files):
+        pages = make_pages(rng, file_index, pages_per_file, words_per_page)
+        if rng.random() < pdf_fraction:
+            path = os.path.join(directory, f"doc_{file_index:04d}.pdf")
+            write_pdf(path, pages)
+        else:
+            path = os.path.join(directory, f"doc_{file_index:04d}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n\n".join(pages))
+        paths.append(path)
+    return paths
+
+
+def sample_queries(num_files: int, pages_per_file: int, num_queries: int, seed: int = 1) -> List[str]:
+    """Questions naming a part number from the corpus, with a few filler words."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        part = f"PN-{rng.randrange(num_files):04d}-{rng.randrange(pages_per_file):03d}-0"
+        queries.append(f"What does the document say about {part} and {' '.join(_zipf_words(rng, 3))}?")
+    return queries
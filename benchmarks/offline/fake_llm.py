@@ -0,0 +1,79 @@
+"""Deterministic local stand-in for the Groq chat model.
+
+It behaves like the real model does in the graph: a user question gets a
+``retrieval`` tool call for that question, and the tool's result gets an
+answer quoting the start of the retrieved text. No network, no key, and the
+same input always gives the same output, so runs are comparable.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """``latency_ms`` is added to every call, to stand in for generation time;
+    ``answer_words`` is how much of the retrieved text the answer quotes."""
+
+    latency_ms: float = 0.0
+    answer_words: int = 60
+    tool_name: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        """Only a model with tools bound calls them, like the real one; the
+        unbound model (used for summaries) just answers."""
+        return self.model_copy(update={"tool_name": tools[0].name})
+
+    def _reply(self, messages) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            words = str(last.content).split()[:self.answer_words]
+            return AIMessage(content="According to the documents: " + " ".join(words))
+        if self.tool_name and isinstance(last, HumanMessage):
+            call_id = "call_" + hashlib.sha256(last.text.encode("utf-8")).hexdigest()[:12]
+            return AIMessage(content="", tool_calls=[{"name": self.tool_name, "args": {"query": last.text}, "id": call_id}])
+        return AIMessage(content="Summary: " + " ".join(m.text for m in messages[1:])[:400])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    def _chunks(self, message: AIMessage):
+        if message.tool_calls:
+            call = message.tool_calls[0]
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}
+            ]))
+            return
+        for word in message.content.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        for chunk in self._chunks(self._reply(messages)):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        for chunk in self._chunks(self._reply(messages)):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,252 @@
+"""End-to-end benchmark of the API without network access or a Groq key.
+
+Generates a synthetic corpus, uploads it through ``/uploadfile/``, then
+measures ``/vectorstore_result`` and ``/query`` at increasing concurrency.
+Requests go through the FastAPI app in-process; the chat model is replaced
+by ``FakeChatModel``, which makes the same ``retrieval`` tool call the real
+one would, so the graph, tool and retrieval all run for real:
+
+    python -m benchmarks.offline.run --files 50 --pages 10 --json results.json
+
+The app runs in a fresh working directory (``--work-dir``, a temp dir by
+default), so the store, uploads and checkpoints start empty. Compare two
+result files with ``python -m benchmarks.offline.compare``.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import httpx
+import numpy as np
+from benchmarks.offline.corpus import generate_corpus, sample_queries
+from benchmarks.offline.fake_llm import FakeChatModel
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentiles(latencies) -> dict:
+    latencies_ms = np.array(latencies or [0.0]) * 1000
+    return {f"p{p}_ms": float(np.percentile(latencies_ms, p)) for p in (50, 95, 99)}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def ingest(client: httpx.AsyncClient, paths, concurrency: int) -> dict:
+    """Upload every file and wait for its ingestion job. Uploads rejected
+    because the ingestion queue is full are retried."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, jobs = [], []
+
+    async def upload(path: str):
+        async with semaphore:
+            with open(path, "rb") as f:
+                content = f.read()
+            start = time.perf_counter()
+            while True:
+                response = await client.post("/uploadfile/", files={"file": (os.path.basename(path), content)})
+                if response.status_code != 429:
+                    break
+                await asyncio.sleep(0.05)
+            response.raise_for_status()
+            status_url = response.json()["status_url"]
+            while True:
+                job = (await client.get(status_url)).json()
+                if job["status"] in ("done", "failed"):
+                    break
+                await asyncio.sleep(0.02)
+            latencies.append(time.perf_counter() - start)
+            jobs.append(job)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(path) for path in paths))
+    elapsed = time.perf_counter() - start
+
+    chunks = sum(job["chunks"] or 0 for job in jobs)
+    stages = {}
+    for job in jobs:
+        for stage, seconds in job["timings"].items():
+            stages[stage] = stages.get(stage, 0) + seconds
+    input_bytes = sum(os.path.getsize(path) for path in paths)
+    return {
+        "files": len(paths),
+        "failed": sum(job["status"] == "failed" for job in jobs),
+        "errors": sorted({job["error"] for job in jobs if job["error"]}),
+        "input_bytes": input_bytes,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "files_per_second": len(paths) / elapsed,
+        "chunks_per_second": chunks / elapsed,
+        "mb_per_second": input_bytes / 2 ** 20 / elapsed,
+        "job_latency": percentiles(latencies),
+        "stage_seconds": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def load_level(client: httpx.AsyncClient, request, queries, concurrency: int) -> dict:
+    """Send one request per query, ``concurrency`` at a time."""
+    pending = list(queries)
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while pending:
+            query = pending.pop()
+            start = time.perf_counter()
+            try:
+                response = await request(query)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(queries),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        **percentiles(latencies),
+    }
+
+
+async def load_test(client: httpx.AsyncClient, name: str, request, queries, levels) -> list:
+    results = []
+    for concurrency in levels:
+        result = await load_level(client, request, queries, concurrency)
+        print(f"{name:>20} {concurrency:>4} clients  {result['throughput_rps']:8.2f} req/s  "
+              f"p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+              f"errors {result['errors']}")
+        results.append(result)
+    return results
+
+
+async def run_suite(app_module, paths, queries, args) -> dict:
+    result = {}
+    transport = httpx.ASGITransport(app=app_module.app)
+    # ASGITransport does not send lifespan events; the startup hooks compile the graph.
+    async with app_module.app.router.lifespan_context(app_module.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        result["ingest"] = await ingest(client, paths, args.upload_concurrency)
+        ingested = result["ingest"]
+        print(f"Ingested {ingested['files']} files ({ingested['chunks']} chunks) in {ingested['seconds']:.2f}s: "
+              f"{ingested['chunks_per_second']:.1f} chunks/s, {ingested['failed']} failed")
+
+        result["vectorstore_result"] = await load_test(
+            client, "/vectorstore_result",
+            lambda query: client.get("/vectorstore_result", params={"query": query}),
+            queries, args.concurrency,
+        )
+        # A new session per request and no answer cache, so every request runs
+        # the whole graph: LLM, retrieval tool, LLM.
+        result["query"] = await load_test(
+            client, "/query",
+            lambda query: client.post("/query", data={"query": query, "session_id": uuid.uuid4().hex, "no_cache": "true"}),
+            queries, args.concurrency,
+        )
+
+    vector_store = app_module.collections.get()
+    result["index"] = {
+        "vectors": vector_store.vector_store.index.ntotal if vector_store.vector_store is not None else 0,
+        "memory_bytes": vector_store.memory_bytes(),
+        "disk_bytes": directory_bytes(app_module.collections.root),
+        "segments_bytes": directory_bytes(os.path.join(app_module.collections.root, "segments")),
+        "embedding_cache_bytes": directory_bytes(os.path.join(app_module.collections.root, "embedding_cache")),
+    }
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with a fake LLM.")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10, help="Pages per file")
+    parser.add_argument("--words", type=int, default=400, help="Words per page")
+    parser.add_argument("--pdf-fraction", type=float, default=0.5)
+    parser.add_argument("--queries", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Simulated time per LLM call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="Where the app keeps its store and uploads (default: a temp dir)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="rag_offline_bench_"))
+    json_path = os.path.abspath(args.json) if args.json else None
+    paths = generate_corpus(os.path.join(work_dir, "corpus"), args.files, args.pages, args.words,
+                            args.pdf_fraction, seed=args.seed)
+    queries = sample_queries(args.files, args.pages, args.queries, seed=args.seed + 1)
+    print(f"Generated {len(paths)} files in {work_dir}")
+
+    # The app keeps its store, uploads and checkpoints relative to the working
+    # directory and reads its key at import, so set both up before importing it.
+    os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+    os.chdir(work_dir)
+    start = time.perf_counter()
+    import app.main as app_module
+    import_seconds = time.perf_counter() - start
+
+    fake_llm = FakeChatModel(latency_ms=args.llm_latency_ms)
+    app_module.llm = fake_llm
+    app_module.llm_with_tool = fake_llm.bind_tools(app_module.tools)
+
+    from app.config import Config
+    result = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("json", "work_dir")},
+            "config": {
+                "EMBEDDING_MODEL": Config.EMBEDDING_MODEL,
+                "EMBEDDING_BACKEND": Config.EMBEDDING_BACKEND,
+                "FAISS_INDEX_TYPE": Config.FAISS_INDEX_TYPE,
+                "RETRIEVAL_MODE": Config.RETRIEVAL_MODE,
+                "RERANK_ENABLED": Config.RERANK_ENABLED,
+            },
+        },
+        "import_seconds": import_seconds,
+        **asyncio.run(run_suite(app_module, paths, queries, args)),
+    }
+    print(f"Index: {result['index']['vectors']} vectors, {result['index']['disk_bytes'] / 2 ** 20:.1f} MB on disk, "
+          f"{result['index']['memory_bytes'] / 2 ** 20:.1f} MB in memory; peak RSS {result['peak_rss_mb']:.1f} MB")
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {json_path}")
+    app_module.ingestion_queue.shutdown()
+
+
+if __name__ == "__main__":
+    main()
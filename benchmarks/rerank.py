@@ -0,0 +1,53 @@
+"""Measure cross-encoder rerank latency by number of candidates, to size
+RERANK_MAX_CANDIDATES and RERANK_LATENCY_BUDGET_MS for the machine:
+
+    python -m benchmarks.rerank --path faiss_store --queries 50 --candidates 10 25 50 100
+
+Candidates come from the store's first-stage search, so their lengths match
+real chunks.
+"""
+import argparse
+import json
+import time
+from app.config import Config
+from app.vector_store.reranker import CrossEncoderReranker
+from app.vector_store.vector_store import VectorStore
+from benchmarks.hybrid_search import percentiles, sample_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-encoder rerank latency by candidate count.")
+    parser.add_argument("--path", default="faiss_store", help="Existing vector store directory")
+    parser.add_argument("--model", default=Config.RERANK_MODEL)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    vector_store = VectorStore(path=args.path)
+    if vector_store.vector_store is None:
+        parser.error(f"No index found at {args.path}")
+    reranker = CrossEncoderReranker(args.model, max_candidates=max(args.candidates),
+                                    max_length=Config.RERANK_MAX_LENGTH)
+    queries = sample_queries(vector_store, args.queries)
+    candidates = {query: vector_store.search(query, k=max(args.candidates)) for query in queries}
+    reranker.score(queries[0], candidates[queries[0]][:1])  # load the model and warm up
+
+    result = {"model": args.model, "latency": {}}
+    for count in args.candidates:
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            reranker.score(query, candidates[query][:count])
+            latencies.append(time.perf_counter() - start)
+        stats = percentiles(latencies)
+        result["latency"][count] = stats
+        print(f"{count:>5} candidates  p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+              f"p99 {stats['p99_ms']:8.1f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
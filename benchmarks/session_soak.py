@@ -0,0 +1,72 @@
+"""Soak test for conversation checkpoint memory.
+
+Runs many sessions through a chat-shaped graph (an echo node stands in for the
+LLM) on the configured checkpointer and samples RSS and checkpointer size as it
+goes. With bounded storage both should level off instead of growing with the
+number of sessions:
+
+    python -m benchmarks.session_soak --sessions 5000 --turns 5
+"""
+import argparse
+import asyncio
+import resource
+import time
+from typing import Annotated, TypedDict
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.graph import START, StateGraph
+from langgraph.graph.message import add_messages
+from app.checkpoint.checkpointer import create_checkpointer, close_checkpointer
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+
+
+async def echo_node(state: ChatState):
+    return {"messages": [AIMessage(content="echo: " + state["messages"][-1].content * 20)]}
+
+
+def rss_mb() -> float:
+    # Current (not peak) resident set size, in pages, from /proc.
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+
+async def soak(sessions: int, turns: int, concurrency: int, sample_every: int):
+    checkpointer = create_checkpointer()
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", echo_node)
+    graph.add_edge(START, "chat_node")
+    chatbot = graph.compile(checkpointer=checkpointer)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_session(i: int):
+        async with semaphore:
+            config = {"configurable": {"thread_id": f"session-{i}"}}
+            for turn in range(turns):
+                await chatbot.ainvoke({"messages": [HumanMessage(content=f"question {turn} from {i} ")]}, config=config)
+
+    start = time.perf_counter()
+    for batch_start in range(0, sessions, sample_every):
+        batch = range(batch_start, min(batch_start + sample_every, sessions))
+        await asyncio.gather(*(run_session(i) for i in batch))
+        stats = checkpointer.stats() if hasattr(checkpointer, "stats") else {}
+        print(f"{batch.stop:>8} sessions  rss {rss_mb():8.1f} MB  "
+              f"threads {stats.get('threads', '-'):>6}  checkpoint bytes {stats.get('bytes', '-'):>12}  "
+              f"elapsed {time.perf_counter() - start:6.1f}s")
+    await close_checkpointer(checkpointer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test for bounded conversation checkpoints.")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sample-every", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(soak(args.sessions, args.turns, args.concurrency, args.sample_every))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Measure cold-start time: how long ``import app.main`` takes, and how long
+after launch a fresh server first answers /healthz and /readyz.
+
+    python -m benchmarks.startup --runs 3
+
+Each run starts a new uvicorn process from the current directory, so the
+store under faiss_store is loaded the way it would be in production.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import() -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def measure_server(timeout: float) -> dict:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {"healthz_seconds": None, "readyz_seconds": None, "readyz": None}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if result["healthz_seconds"] is None and client.get("/healthz").status_code == 200:
+                        result["healthz_seconds"] = time.perf_counter() - start
+                    response = client.get("/readyz")
+                    if response.status_code == 200:
+                        result["readyz_seconds"] = time.perf_counter() - start
+                        result["readyz"] = response.json()
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time-to-ready of the API.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    imports = [measure_import() for _ in range(args.runs)]
+    servers = [measure_server(args.timeout) for _ in range(args.runs)]
+    result = {
+        "import_seconds": imports,
+        "healthz_seconds": [s["healthz_seconds"] for s in servers],
+        "readyz_seconds": [s["readyz_seconds"] for s in servers],
+        "last_readyz": servers[-1]["readyz"],
+    }
+    for name in ("import_seconds", "healthz_seconds", "readyz_seconds"):
+        values = [v for v in result[name] if v is not None]
+        summary = f"median {np.median(values):.2f}s, max {max(values):.2f}s" if values else "timed out"
+        print(f"{name:>16}: {summary}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
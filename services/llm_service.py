@@ -1,155 +1,134 @@
+import asyncio
+from collections import OrderedDict
+from typing import Callable, List, Tuple
 from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from typing import List
-# from langchain.memory import ConversationBufferMemory
-# from langchain.chains import ConversationalRetrievalChain
-from langchain_groq import ChatGroq
-from app.config import Config
+from app.vector_store.lexical_index import reciprocal_rank_fusion
+from app.metrics.registry import span
 from app.logger import logging
 
-class LLmService:
-    def __init__(self, vector_store, query: str):
-        logging.info("Initializing LLM Service.")
-        self.llm = ChatGroq(
-        model_name="llama-3.3-70b-versatile",
-        api_key=Config.qroq_api_key,
-        )
-
-        self.model = self.llm
-        self.query = query
-        self.vector_store = vector_store
-
-        self.retriever = None
-        try:
-            if vector_store and hasattr(vector_store, "vector_store"):
-                self.retriever = vector_store.vector_store.as_retriever(
-                    search_type="similarity", search_kwargs={"k": 4}
-                )
-        except Exception:
-            self.retriever = None
-
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True,
-        )
-
-    def query_refinement(self) -> str:
-        query_prompt = PromptTemplate(
-            template="""Improve the clarity, grammar, and structure of the following user query while
-keeping the original intent unchanged. Remove ambiguity and make it easy for an LLM to understand:
+REFINE_PROMPT = PromptTemplate(
+    template="""Improve the clarity, grammar, and structure of the following user query while
+keeping the original intent unchanged. Remove ambiguity and make it easy for an LLM to understand.
+Reply with the rewritten query only.
 
 User Query: {query}
 """,
-            input_variables=["query"]
-        )
-        parser = StrOutputParser()
-        chain = query_prompt | self.model | parser
-        refined_query = chain.invoke({"query": self.query})
-        return refined_query
-
-    def get_documents(self) -> List[Document]:
-        query = self.query_refinement()
-        if self.retriever is None:
-            return []   
-        try:
-            results = self.retriever.invoke(query)
-        except Exception:
-            results = []
-        return results
+    input_variables=["query"]
+)
 
-    def _build_memory_text(self) -> str:
-        """Create a simple text snapshot of the conversation buffer for the prompt."""
-        memory_text = ""
-        try:
-            chat_mem = getattr(self.memory, "chat_memory", None)
-            if chat_mem and hasattr(chat_mem, "messages"):
-                for msg in chat_mem.messages:
-                  
-                    typ = getattr(msg, "type", None)
-                    content = getattr(msg, "content", str(msg))
-                    if typ == "human" or typ == "user":
-                        memory_text += f"User: {content}\n"
-                    else:
-                        memory_text += f"AI: {content}\n"
-        except Exception:
-            
-            memory_text = ""
-        return memory_text
+ANSWER_PROMPT = PromptTemplate(
+    template="""You are an AI assistant that provides helpful and accurate information based on the provided context and known user memory.
+Use the context and any stored memory facts to answer the question as accurately as possible. If the context does not contain relevant information, respond with "I don't know".
 
-    def generate_response(self) -> str:
-        logging.info("Generating response from LLM Service.")
+Context:
+{context}
 
-        documents = self.get_documents()
-        logging.info(f"Retrieved {len(documents)} documents from vector store.")
-        if not documents:
-            logging.info("No documents retrieved; using general knowledge only.")
-            context = "No external documents provided. Answer only from general knowledge."
-        else:
-            logging.info("Building context from retrieved documents.")
-            context = "\n\n".join([doc.page_content for doc in documents])
+Memory:
+{memory}
 
-        logging.info("Refining user query.")
-        query = self.query_refinement()
+Question:
+{query}
 
+Answer:""",
+    input_variables=["context", "memory", "query"]
+)
 
-        if self.retriever is not None:
-            logging.info("Using ConversationalRetrievalChain for response generation.")
-            conv_chain = ConversationalRetrievalChain.from_llm(
-                llm=self.model,
-                retriever=self.retriever,
-                memory=self.memory,
-                output_key="answer"
-            )
-            
-            result = conv_chain.invoke({"question": query})
-            answer = result.get("answer") or result.get("output_text") or str(result)
-            logging.info("Response generated using ConversationalRetrievalChain.")
 
-            try:
-                logging.info("Saving context to memory.")
-                self.memory.save_context({"question": query}, {"answer": answer})
-            except Exception:
-               
-                pass
-
-
-        logging.info("Building memory text for prompt.")
-        memory_text = self._build_memory_text()
-
-
-        logging.info("Creating prompt template for response generation.")
-        prompt_template = PromptTemplate(
-            template="""You are an AI assistant that provides helpful and accurate information based on the provided context and known user memory.
-                Use the context and any stored memory facts to answer the question as accurately as possible. If the context does not contain relevant information, respond with "I don't know".
-
-                    Context:
-                    {context}
-
-                    Memory:
-                    {memory}
+class LLmService:
+    """Retrieve-then-generate pipeline without the agent loop.
 
-                    Question:
-                    {query}
+    Per question: the query is refined (memoized, so a repeated question costs
+    no LLM call) while retrieval on the raw query runs at the same time; the
+    refined query is then searched too, both rankings are fused, and a single
+    generation call writes the answer. One LLM call per question when the
+    refinement is cached, two otherwise, against at least two for the
+    tool-calling graph.
+    """
 
-                    Answer:""",
-            input_variables=["context", "memory", "query"]
+    def __init__(self, llm, refine: bool = True, refine_cache_size: int = 1024, history_messages: int = 6):
+        logging.info("Initializing LLM Service.")
+        self.llm = llm
+        self.refine = refine
+        self.refine_cache_size = refine_cache_size
+        self.history_messages = history_messages
+        self._refined = OrderedDict()
+        self._refining = {}
+
+    async def _refine(self, query: str) -> str:
+        with span("llm_refine"):
+            refined = await (REFINE_PROMPT | self.llm | StrOutputParser()).ainvoke({"query": query})
+        return refined.strip() or query
+
+    async def query_refinement(self, query: str) -> str:
+        """The refined query, computed once per distinct query. Concurrent
+        requests for the same query share one LLM call; on failure the raw
+        query is used."""
+        if not self.refine:
+            return query
+        key = " ".join(query.lower().split())
+        if key in self._refined:
+            self._refined.move_to_end(key)
+            return self._refined[key]
+        task = self._refining.get(key)
+        if task is None:
+            task = self._refining[key] = asyncio.ensure_future(self._refine(query))
+        try:
+            refined = await asyncio.shield(task)
+        except Exception as e:
+            logging.warning(f"Query refinement failed, using the raw query: {e}")
+            return query
+        finally:
+            if task.done():
+                self._refining.pop(key, None)
+        self._refined[key] = refined
+        while len(self._refined) > self.refine_cache_size:
+            self._refined.popitem(last=False)
+        return refined
+
+    async def get_documents(self, query: str, retrieve: Callable[[str], List[Document]]) -> Tuple[str, List[Document]]:
+        """Refine ``query`` while ``retrieve`` (a blocking search) runs on the
+        raw query, then fuse with the results for the refined query."""
+        raw_results, refined = await asyncio.gather(
+            asyncio.to_thread(retrieve, query),
+            self.query_refinement(query),
         )
+        if refined == query:
+            return refined, raw_results
+        refined_results = await asyncio.to_thread(retrieve, refined)
+        by_text = {doc.page_content: doc for doc in [*refined_results, *raw_results]}
+        fused = reciprocal_rank_fusion([
+            [doc.page_content for doc in refined_results],
+            [doc.page_content for doc in raw_results],
+        ])
+        return refined, [by_text[text] for text in fused[:max(len(raw_results), len(refined_results))]]
+
+    def _build_memory_text(self, history: List[BaseMessage]) -> str:
+        """The last ``history_messages`` turns of the session as plain text."""
+        memory_text = ""
+        turns = [msg for msg in history if msg.type in ("human", "ai") and msg.text]
+        for msg in turns[-self.history_messages:] if self.history_messages else []:
+            memory_text += f"{'User' if msg.type == 'human' else 'AI'}: {msg.text}\n"
+        return memory_text
 
-        parser = StrOutputParser()
-        logging.info("Building chain for final response generation.")
-        chain = prompt_template | self.model | parser
+    async def agenerate(self, query: str, retrieve: Callable[[str], List[Document]],
+                        history: List[BaseMessage] = ()) -> str:
+        logging.info("Generating response from LLM Service.")
+        refined, documents = await self.get_documents(query, retrieve)
+        logging.info(f"Retrieved {len(documents)} documents from vector store.")
+        if not documents:
+            context = "No external documents provided. Answer only from general knowledge."
+        else:
+            context = "\n\n".join([doc.page_content for doc in documents])
 
-        response = chain.invoke({
-            "context": context,
-            "memory": memory_text,
-            "query": query
-        })
-  
-        try:
-            logging.info("Saving context to memory.")
-            self.memory.save_context({"question": query}, {"answer": response})
-        except Exception:
-            pass
+        chain = ANSWER_PROMPT | self.llm | StrOutputParser()
+        with span("llm"):
+            response = await chain.ainvoke({
+                "context": context,
+                "memory": self._build_memory_text(history),
+                "query": refined,
+            })
         logging.info("Response generation complete.")
         return response